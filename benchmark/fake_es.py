@@ -0,0 +1,357 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index import entity
+
+# lightweight local stand-in of Elasticsearch (7.x) for the benchmarks - imitates the endpoints used by the
+# indexer (_bulk, _search, _msearch, sliced scrolls, _cat/count, _delete_by_query & index management) with
+# configurable latency - the stored scripts of the entity-docs are applied by their Python equivalent
+# (entity.apply_script) for scripted upserts & _update_by_query
+#
+# docs are kept (by id) so that the baseline index can be scrolled (index.ext.source=baseline), property-docs
+# (with 'resource_terms') are also kept by resource so that the searches of the extended indexing return hits
+# - request counters are served at /_bench/stats
+#   python3 benchmark/fake_es.py [-port <number>] [-search_latency <ms>] [-bulk_latency <ms>]
+
+# reentrant - updates apply their script & store the doc under the lock (as the versioned updates of ES)
+lock = threading.RLock()
+
+# index -> {doc id: doc}
+docs = {}
+
+# index -> settings (number_of_shards, creation_date)
+settings = {}
+
+# open scrolls - scroll id -> [hits, position, page size]
+scrolls = {}
+
+# property-index -> resource -> {doc id: doc}
+properties = {}
+
+# request counters - 'searches' counts the searches inside multi-search requests as well
+stats = {"requests": {}, "searches": 0, "bulk_docs": 0}
+
+latency = {"search": 0.0, "bulk": 0.0}
+
+
+def count_request(key):
+    with lock:
+        stats["requests"][key] = stats["requests"].get(key, 0) + 1
+
+
+def index_doc(index, doc_id, doc):
+    with lock:
+        docs.setdefault(index, {})[doc_id] = doc
+        if "resource_terms" in doc:
+            properties.setdefault(index, {}).setdefault(doc["resource_terms"], {})[doc_id] = doc
+
+
+def delete_doc(index, doc_id):
+    with lock:
+        docs.get(index, {}).pop(doc_id, None)
+        for resource_docs in properties.get(index, {}).values():
+            resource_docs.pop(doc_id, None)
+
+
+# hits of a (constant_score) term(s) query over the property-docs
+def term_hits(index, body, size):
+    with lock:
+        stats["searches"] += 1
+    query = body.get("query", {})
+    term_filter = query.get("constant_score", {}).get("filter", query)
+    if "term" in term_filter:
+        (field, value), = term_filter["term"].items()
+        values = [value]
+    elif "terms" in term_filter:
+        (field, values), = term_filter["terms"].items()
+    else:
+        return []
+
+    hits = []
+    with lock:
+        index_properties = properties.get(index, {})
+        for value in values:
+            for doc_id, doc in index_properties.get(value, {}).items():
+                hits.append({"_index": index, "_id": doc_id, "_source": doc})
+    return hits[:size]
+
+
+def as_list(clauses):
+    return clauses if isinstance(clauses, list) else [clauses]
+
+
+# whether a doc matches a (scroll or delete-by-query) query - match_all, term(s) on single or multi-valued fields
+# (multi-fields, e.g. 'raw', match the values of their field) & bool (filter, must, should, must_not)
+def matches(doc, query):
+    if "bool" in query:
+        clauses = query["bool"]
+        if not all(matches(doc, clause) for clause in as_list(clauses.get("filter", [])) +
+                   as_list(clauses.get("must", []))):
+            return False
+        if any(matches(doc, clause) for clause in as_list(clauses.get("must_not", []))):
+            return False
+        should = as_list(clauses.get("should", []))
+        return len(should) == 0 or any(matches(doc, clause) for clause in should)
+    if "term" in query:
+        (field, value), = query["term"].items()
+        values = [value]
+    elif "terms" in query:
+        (field, values), = query["terms"].items()
+    else:
+        return True
+    doc_values = doc.get(field.split(".")[0])
+    if not isinstance(doc_values, list):
+        doc_values = [doc_values]
+    return any(value in values for value in doc_values)
+
+
+# applies a stored script (entity.SCRIPTS) to a doc, a scripted upsert creates it - returns the result
+def update_doc(index, doc_id, script, upsert=None):
+    with lock:
+        doc = docs.get(index, {}).get(doc_id)
+        if doc is None:
+            if upsert is None:
+                return "not_found"
+            doc = dict(upsert)
+        doc = json.loads(json.dumps(doc))
+        if entity.apply_script(script["id"], doc, script.get("params", {})) == "delete":
+            delete_doc(index, doc_id)
+            return "deleted"
+        index_doc(index, doc_id, doc)
+        return "updated"
+
+
+# first page of a sliced scroll over the docs of an index - the docs of a slice are those whose id hashes to it
+def open_scroll(index, body, size):
+    query = body.get("query", {})
+    slice_id, slices = 0, 1
+    if "slice" in body:
+        slice_id, slices = body["slice"]["id"], body["slice"]["max"]
+    with lock:
+        hits = [{"_index": index, "_id": doc_id, "_source": doc} for doc_id, doc in docs.get(index, {}).items()
+                if zlib.crc32(doc_id.encode("utf-8")) % slices == slice_id and matches(doc, query)]
+        scroll_id = "scroll-" + str(len(scrolls)) + "-" + str(time.time())
+        scrolls[scroll_id] = [hits, 0, size]
+    return next_page(scroll_id)
+
+
+def next_page(scroll_id):
+    with lock:
+        scroll = scrolls[scroll_id]
+        hits, position, size = scroll
+        scroll[1] = position + size
+    return dict(search_response(hits[position:position + size]), _scroll_id=scroll_id)
+
+
+def search_response(hits):
+    return {"took": 1, "timed_out": False, "hits": {"total": {"value": len(hits), "relation": "eq"},
+                                                    "hits": hits}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, obj):
+        if isinstance(obj, str):
+            data = obj.encode("utf-8")
+            content_type = "text/plain"
+        else:
+            data = json.dumps(obj).encode("utf-8")
+            content_type = "application/json"
+        self.send_response(code)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        return raw
+
+    def route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        raw = self.read_body()
+        count_request(self.command + " /" + "/".join(part if part.startswith("_") else "*" for part in parts))
+
+        if len(parts) == 0:
+            return self.send(200, {"version": {"number": "7.17.0", "build_flavor": "default"},
+                                   "tagline": "You Know, for Search"})
+
+        if parts[0] == "_bench":
+            if parts[-1] == "reset":
+                with lock:
+                    stats["requests"] = {}
+                    stats["searches"] = 0
+                    stats["bulk_docs"] = 0
+                return self.send(200, {"acknowledged": True})
+            with lock:
+                return self.send(200, dict(stats, docs={index: len(index_docs) for index, index_docs in docs.items()}))
+
+        if parts[-1] == "_bulk":
+            return self.bulk(parts, raw)
+
+        if parts[0] == "_search" and parts[-1] == "scroll":
+            body = json.loads(raw or b"{}")
+            scroll_ids = body.get("scroll_id") or query.get("scroll_id", [""])[0]
+            if self.command == "DELETE":
+                if not isinstance(scroll_ids, list):
+                    scroll_ids = scroll_ids.split(",")
+                with lock:
+                    freed = len([scrolls.pop(scroll_id) for scroll_id in scroll_ids if scroll_id in scrolls])
+                return self.send(200, {"succeeded": True, "num_freed": freed})
+            if scroll_ids not in scrolls:
+                return self.send(404, {"error": "no such scroll: " + str(scroll_ids), "status": 404})
+            return self.send(200, next_page(scroll_ids))
+
+        if parts[-1] == "_msearch":
+            time.sleep(latency["search"])
+            lines = [line for line in raw.decode("utf-8").split("\n") if line.strip()]
+            responses = []
+            for header, body in zip(lines[0::2], lines[1::2]):
+                header = json.loads(header)
+                body = json.loads(body)
+                index = header.get("index", parts[0] if len(parts) > 1 else None)
+                responses.append(search_response(term_hits(index, body, body.get("size", 10))))
+            return self.send(200, {"took": 1, "responses": responses})
+
+        if parts[-1] == "_search":
+            time.sleep(latency["search"])
+            body = json.loads(raw or b"{}")
+            size = int(query.get("size", [body.get("size", 10)])[0])
+            if "scroll" in query:
+                return self.send(200, open_scroll(parts[0], body, size))
+            return self.send(200, search_response(term_hits(parts[0], body, size)))
+
+        if parts[0] == "_cat" and parts[1] == "count":
+            with lock:
+                count = len(docs.get(parts[2], ()))
+            return self.send(200, str(int(time.time())) + " 00:00:00 " + str(count) + "\n")
+
+        if parts[-1] == "_count":
+            with lock:
+                return self.send(200, {"count": len(docs.get(parts[0], ()))})
+
+        if parts[-1] == "_delete_by_query":
+            query = json.loads(raw or b"{}").get("query", {})
+            with lock:
+                doc_ids = [doc_id for doc_id, doc in docs.get(parts[0], {}).items() if matches(doc, query)]
+            for doc_id in doc_ids:
+                delete_doc(parts[0], doc_id)
+            return self.send(200, {"deleted": len(doc_ids)})
+
+        if parts[-1] == "_update_by_query":
+            body = json.loads(raw or b"{}")
+            with lock:
+                doc_ids = [doc_id for doc_id, doc in docs.get(parts[0], {}).items()
+                           if matches(doc, body.get("query", {}))]
+            results = [update_doc(parts[0], doc_id, body["script"]) for doc_id in doc_ids]
+            return self.send(200, {"total": len(doc_ids), "updated": results.count("updated"),
+                                   "deleted": results.count("deleted")})
+
+        if parts[0] == "_scripts":
+            return self.send(200, {"acknowledged": True})
+
+        if parts[-1] == "_settings" and self.command == "GET":
+            with lock:
+                index_settings = settings.get(parts[0])
+            if index_settings is None:
+                return self.send(404, {"error": "no such index: " + parts[0], "status": 404})
+            return self.send(200, {parts[0]: {"settings": {"index": index_settings}}})
+
+        if parts[-1] in ("_settings", "_refresh", "_forcemerge", "_flush"):
+            return self.send(200, {"acknowledged": True, "_shards": {"total": 1, "successful": 1, "failed": 0}})
+
+        if len(parts) == 1:
+            with lock:
+                exists = parts[0] in docs
+                if self.command == "PUT":
+                    docs.setdefault(parts[0], {})
+                    index_settings = json.loads(raw or b"{}").get("settings", {})
+                    index_settings = index_settings.get("index", index_settings)
+                    settings[parts[0]] = {"number_of_shards": str(index_settings.get("number_of_shards", 1)),
+                                          "creation_date": str(int(time.time() * 1000))}
+                elif self.command == "DELETE":
+                    docs.pop(parts[0], None)
+                    properties.pop(parts[0], None)
+                    settings.pop(parts[0], None)
+            if self.command == "HEAD":
+                return self.send(200 if exists else 404, "")
+            return self.send(200, {"acknowledged": True, "index": parts[0]})
+
+        return self.send(404, {"error": "not supported by the benchmark stand-in: " + self.path})
+
+    def bulk(self, parts, raw):
+        time.sleep(latency["bulk"])
+        default_index = parts[0] if len(parts) > 1 else None
+        lines = raw.decode("utf-8").split("\n")
+        items = []
+        i = 0
+        while i < len(lines):
+            if not lines[i].strip():
+                i += 1
+                continue
+            (op, meta), = json.loads(lines[i]).items()
+            index = meta.get("_index", default_index)
+            doc_id = meta.get("_id", str(len(items)) + "-" + str(time.time()))
+            status = 201
+            if op == "delete":
+                delete_doc(index, doc_id)
+                i += 1
+            elif op == "update":
+                body = json.loads(lines[i + 1])
+                if update_doc(index, doc_id, body["script"], body.get("upsert")) == "not_found":
+                    status = 404
+                i += 2
+            else:
+                index_doc(index, doc_id, json.loads(lines[i + 1]))
+                i += 2
+            items.append({op: {"_index": index, "_id": doc_id, "status": status}})
+
+        with lock:
+            stats["bulk_docs"] += len(items)
+        return self.send(200, {"took": 1, "errors": any(item[op]["status"] == 404 for item in items for op in item),
+                               "items": items})
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = route
+
+
+def serve(port, search_latency=0.0, bulk_latency=0.0):
+    latency["search"] = search_latency
+    latency["bulk"] = bulk_latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='\'Local Elasticsearch stand-in for the benchmarks\'')
+    parser.add_argument('-port', type=int, default=9299, help='"port to listen on')
+    parser.add_argument('-search_latency', type=float, default=0, help='"latency of each (multi-)search, in ms')
+    parser.add_argument('-bulk_latency', type=float, default=0, help='"latency of each bulk request, in ms')
+    args = parser.parse_args()
+
+    print("Elas4RDF: benchmark ES stand-in listening on 127.0.0.1:" + str(args.port))
+    serve(args.port, args.search_latency / 1000.0, args.bulk_latency / 1000.0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import math
+import os
+import random
+
+# synthetic DBpedia-like N-Triples: entities are described by consecutive triples (as in the DBpedia dumps),
+# entity popularity (objects, types, categories) follows a zipf-like distribution & literals have realistic
+# lengths, language/datatype tags & escapes
+#   python3 benchmark/generate.py -output <dir> [-triples <number>] [-files <number>] [-seed <number>]
+
+RESOURCE = "http://dbpedia.org/resource/"
+ONTOLOGY = "http://dbpedia.org/ontology/"
+PROPERTY = "http://dbpedia.org/property/"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+RDFS_COMMENT = "http://www.w3.org/2000/01/rdf-schema#comment"
+DCT_SUBJECT = "http://purl.org/dc/terms/subject"
+OWL_SAME_AS = "http://www.w3.org/2002/07/owl#sameAs"
+FOAF_TOPIC = "http://xmlns.com/foaf/0.1/isPrimaryTopicOf"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+CLASSES = ["Place", "PopulatedPlace", "City", "Country", "Person", "Athlete", "Artist", "Organisation",
+           "Company", "Band", "Album", "Film", "Book", "Species", "Building", "River", "Mountain", "Event"]
+
+OBJECT_PROPERTIES = ["country", "birthPlace", "deathPlace", "location", "city", "team", "genre", "author",
+                     "director", "starring", "recordLabel", "influencedBy", "spouse", "region", "isPartOf"]
+
+LITERAL_PROPERTIES = [("populationTotal", "nonNegativeInteger"), ("areaTotal", "double"), ("birthDate", "date"),
+                      ("foundingYear", "gYear"), ("elevation", "double"), ("runtime", "double"),
+                      ("name", None), ("motto", None), ("nickname", None)]
+
+WORDS = ["the", "of", "and", "in", "is", "a", "was", "to", "city", "river", "known", "largest", "capital", "born",
+         "album", "band", "released", "film", "american", "greek", "century", "population", "located", "north",
+         "south", "island", "region", "team", "football", "played", "first", "second", "university", "school",
+         "species", "family", "state", "municipality", "district", "mountain", "national", "international",
+         "company", "founded", "record", "label", "singer", "writer", "novel", "series", "season", "war"]
+
+NAME_PARTS = ["Athens", "Crete", "Paris", "John", "Smith", "Maria", "New", "York", "River", "Saint", "Lake",
+              "George", "Anna", "Black", "Sea", "North", "Island", "Park", "Street", "Company", "Records", "FC",
+              "(band)", "(album)", "(film)", "Müller", "São_Paulo", "Zürich", "Łódź", "Jean-Paul", "O'Brien"]
+
+
+# zipf-like pick of an index in [0, size) - small indexes are the most popular
+def popular(rnd, size, skew=1.2):
+    return min(size - 1, int(size * math.pow(rnd.random(), skew * 3)))
+
+
+# name of the number-th entity - objects refer to the (described) entities by their name
+def entity_name(number):
+    rnd = random.Random(number)
+    parts = [rnd.choice(NAME_PARTS) for _ in range(rnd.randint(1, 3))]
+    return "_".join(parts) + "_" + str(number)
+
+
+def sentence(rnd, min_words, max_words):
+    text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(min_words, max_words)))
+    # quotes & backslashes are escaped, as in the dumps
+    if rnd.random() < 0.05:
+        text += " \\\"quoted\\\""
+    if rnd.random() < 0.02:
+        text += " \\u00E9t\\u00E9"
+    return text[0].upper() + text[1:] + "."
+
+
+def literal(rnd, datatype):
+    if datatype == "nonNegativeInteger":
+        value = str(rnd.randint(0, 10000000))
+    elif datatype == "double":
+        value = "{:.2f}".format(rnd.random() * 10000)
+    elif datatype == "date":
+        value = "{}-{:02d}-{:02d}".format(rnd.randint(1800, 2020), rnd.randint(1, 12), rnd.randint(1, 28))
+    elif datatype == "gYear":
+        value = str(rnd.randint(1500, 2020))
+    else:
+        return "\"" + sentence(rnd, 1, 4)[:-1] + "\"@en"
+    return "\"" + value + "\"^^<" + XSD + datatype + ">"
+
+
+# the triples describing an entity
+def entity_triples(rnd, number, entities, categories):
+    name = entity_name(number)
+    sub = "<" + RESOURCE + name + ">"
+    triples = [(sub, RDF_TYPE, "<" + ONTOLOGY + CLASSES[popular(rnd, len(CLASSES))] + ">"),
+               (sub, RDFS_LABEL, "\"" + name.replace("_", " ") + "\"@en")]
+
+    if rnd.random() < 0.8:
+        triples.append((sub, RDFS_COMMENT, "\"" + sentence(rnd, 10, 80) + "\"@en"))
+
+    for _ in range(rnd.randint(1, 4)):
+        triples.append((sub, DCT_SUBJECT, "<" + RESOURCE + "Category:Topic_" + str(popular(rnd, categories)) + ">"))
+
+    for _ in range(rnd.randint(0, 6)):
+        obj = "<" + RESOURCE + entity_name(popular(rnd, entities)) + ">"
+        triples.append((sub, ONTOLOGY + rnd.choice(OBJECT_PROPERTIES), obj))
+
+    for _ in range(rnd.randint(0, 4)):
+        prop, datatype = rnd.choice(LITERAL_PROPERTIES)
+        triples.append((sub, PROPERTY + prop, literal(rnd, datatype)))
+
+    if rnd.random() < 0.5:
+        triples.append((sub, OWL_SAME_AS, "<http://www.wikidata.org/entity/Q" + str(rnd.randint(1, 9999999)) + ">"))
+    if rnd.random() < 0.5:
+        triples.append((sub, FOAF_TOPIC, "<http://en.wikipedia.org/wiki/" + name + ">"))
+
+    return triples
+
+
+# writes ~triples triples into files .nt files of directory output - returns the number of triples written
+def generate(output, triples, files=1, seed=1):
+    os.makedirs(output, exist_ok=True)
+    rnd = random.Random(seed)
+
+    # ~10 triples per entity
+    entities = max(1, triples // 10)
+    categories = max(1, entities // 20)
+
+    written = 0
+    per_file = int(math.ceil(triples / float(files)))
+    number = 0
+    for f in range(files):
+        with open(os.path.join(output, "part-" + str(f) + ".nt"), "w", encoding="utf-8") as fp:
+            file_written = 0
+            while file_written < per_file and written < triples:
+                for sub, pre, obj in entity_triples(rnd, number, entities, categories):
+                    fp.write(sub + " <" + pre + "> " + obj + " .\n")
+                    file_written += 1
+                    written += 1
+                number += 1
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='\'Synthetic DBpedia-like N-Triples generator\'')
+    parser.add_argument('-output', help='"output directory', required=True)
+    parser.add_argument('-triples', type=int, default=1000000, help='"number of triples (approximately)')
+    parser.add_argument('-files', type=int, default=1, help='"number of .nt files')
+    parser.add_argument('-seed', type=int, default=1, help='"random seed')
+    args = parser.parse_args()
+
+    written = generate(args.output, args.triples, args.files, args.seed)
+    print("Elas4RDF: generated " + str(written) + " triples in " + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import os
+import random
+import re
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from index import ntparser
+
+
+# micro-benchmark: lines/sec of index/ntparser against the previous (inline) parsing
+# of baseline_index/extended_index
+#   python3 benchmark/ntparser_bench.py [-input <file.nt>] [-lines <number>]
+
+
+def get_name_space(triple_part, pred_flag):
+    if pred_flag:
+        n_space = triple_part.rsplit('#', 1)[0]
+    else:
+        n_space = triple_part.rsplit('/', 1)[0]
+
+    return n_space
+
+
+def contains_prefix(uri):
+    return uri.rsplit(':', 1)[0].__contains__(":")
+
+
+# the parsing previously inlined in baseline_index/extended_index
+def legacy_parse(line):
+    if "<" not in line:
+        return None
+
+    line = line.replace("<", "").replace(">", "").replace("\n", "")
+    contents = line.split(" ", 2)
+
+    if len(contents) < 3:
+        return None
+
+    if contains_prefix(contents[0]):
+        split_prefix = contents[0].rsplit(':', 1)
+        sub_keywords = split_prefix[0].split("/")[-1] + ":" + split_prefix[1]
+        sub_nspace = ''.join(re.split("(/)", split_prefix[0])[:-1])
+    else:
+        sub_keywords = contents[0].rsplit('/', 1)[-1].replace(":", "")
+        sub_nspace = get_name_space(contents[0], False)
+
+    if "#" not in contents[1]:
+        pred_keywords = contents[1].rsplit('/', 1)[-1].replace(":", "")
+        pred_nspace = get_name_space(contents[1], False)
+    else:
+        pred_keywords = contents[1].rsplit('#', 1)[-1].replace(":", "")
+        pred_nspace = get_name_space(contents[1], True)
+
+    obj_keywords = ""
+    obj_nspace = ""
+    if "\"" in contents[2]:
+        obj_keywords = contents[2].replace("\"", " ")[:-2]
+        obj_nspace = ""
+    elif "/" in contents[2]:
+        if contains_prefix(contents[2]):
+            split_prefix = contents[2].rsplit(':', 1)
+            obj_keywords = split_prefix[0].split("/")[-1] + ":" + split_prefix[1][:-2]
+            obj_nspace = ''.join(re.split("(/)", split_prefix[0])[:-1])
+        else:
+            obj_keywords = contents[2].rsplit('/', 1)[-1].replace(":", "")[:-2]
+            obj_nspace = get_name_space(contents[2], False)
+    elif "#" in contents[2]:
+        obj_keywords = contents[2].rsplit('#', 1)[-1].replace(":", "")[:-2]
+
+    return (contents[0], contents[1], contents[2], sub_keywords, sub_nspace, pred_keywords, pred_nspace,
+            obj_keywords, obj_nspace)
+
+
+# DBpedia-like sample lines
+def sample_lines(number):
+    resource = "http://dbpedia.org/resource/"
+    predicates = ["http://dbpedia.org/ontology/country", "http://dbpedia.org/ontology/birthPlace",
+                  "http://www.w3.org/1999/02/22-rdf-syntax-ns#type", "http://www.w3.org/2000/01/rdf-schema#label",
+                  "http://www.w3.org/2000/01/rdf-schema#comment", "http://purl.org/dc/terms/subject"]
+    words = ["island", "Greece", "the", "largest", "city", "of", "capital", "river", "population", "is"]
+
+    rnd = random.Random(1)
+    lines = []
+    for i in range(number):
+        sub = "<" + resource + "Entity_" + str(rnd.randint(0, number // 10)) + ">"
+        pre = predicates[rnd.randint(0, len(predicates) - 1)]
+        if pre.endswith("comment") or pre.endswith("label"):
+            obj = "\"" + " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 60))) + "\"@en"
+        elif pre.endswith("subject"):
+            obj = "<" + resource + "Category:Topic_" + str(rnd.randint(0, 1000)) + ">"
+        elif pre.endswith("type"):
+            obj = "<http://dbpedia.org/ontology/Place>"
+        else:
+            obj = "<" + resource + "Entity_" + str(rnd.randint(0, number // 10)) + ">"
+        lines.append(sub + " <" + pre + "> " + obj + " .\n")
+    return lines
+
+
+def run(name, parse, lines, rounds):
+    best = None
+    for _ in range(rounds):
+        start = timer()
+        for line in lines:
+            parse(line)
+        elapsed = timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print("\t" + name + ": " + "{:,.0f}".format(len(lines) / best) + " lines/sec")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='\'N-Triples parser micro-benchmark\'')
+    parser.add_argument('-input', help='"an .nt file (defaults to generated DBpedia-like lines)')
+    parser.add_argument('-lines', type=int, default=200000, help='"number of lines to parse')
+    parser.add_argument('-rounds', type=int, default=3, help='"rounds (best is reported)')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as fp:
+            lines = [line for _, line in zip(range(args.lines), fp)]
+    else:
+        lines = sample_lines(args.lines)
+
+    print("Elas4RDF: parsing " + str(len(lines)) + " lines")
+    legacy = run("legacy", legacy_parse, lines, args.rounds)
+    current = run("ntparser", ntparser.parse_line, lines, args.rounds)
+    print("\tspeed-up: " + "{:.2f}".format(legacy / current) + "x")
+
+
+if __name__ == "__main__":
+    main()
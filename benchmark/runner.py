@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmark import generate
+
+# end-to-end ingestion benchmark: generates a synthetic dataset, starts the local ES stand-in & runs the
+# baseline & extended indexing (indexer_service.py) for several index.instances values - reports
+# triples/sec, searches (& multi-search requests) per triple & the peak RSS of an index instance
+#   python3 benchmark/runner.py [-triples <number>] [-instances 1,2,4] [-search_latency <ms>] [-bulk_latency <ms>]
+#                               [-set <key=value> ..] [-output <results.json>]
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+BASE_INDEX = "bench_base"
+EXT_INDEX = "bench_ext"
+EXT_FIELDS = "rdfs_comment;http://www.w3.org/2000/01/rdf-schema#comment"
+
+
+def es_request(port, path, method="GET"):
+    request = urllib.request.Request("http://127.0.0.1:" + str(port) + path, method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def start_es(port, search_latency, bulk_latency):
+    try:
+        es_request(port, "/")
+        print("Elas4RDF error: port " + str(port) + " is already in use (see -port)")
+        sys.exit(-1)
+    except OSError:
+        pass
+
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmark", "fake_es.py"),
+                                "-port", str(port), "-search_latency", str(search_latency),
+                                "-bulk_latency", str(bulk_latency)], stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            es_request(port, "/")
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    print("Elas4RDF error: the ES stand-in did not start on port " + str(port))
+    sys.exit(-1)
+
+
+def write_config(path, data_dir, port, instances, base, ext, options):
+    lines = ["index.id=benchmark",
+             "index.base=" + ("yes" if base else "no"),
+             "index.base.name=" + BASE_INDEX,
+             "index.ext=" + ("yes" if ext else "no"),
+             "index.ext.name=" + EXT_INDEX,
+             "index.ext.fields=" + EXT_FIELDS,
+             "index.data=" + data_dir,
+             "index.instances=" + str(instances),
+             "elastic.address=127.0.0.1",
+             "elastic.port=" + str(port)]
+    lines.extend(options)
+    with open(path, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+
+# runs the indexer - returns (elapsed time, peak RSS in MB of the largest process)
+def run_indexer(work_dir, config_path, log_path):
+    with open(log_path, "w") as log:
+        start = timer()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "indexer_service.py"), "-config", config_path],
+                                   cwd=work_dir, stdin=subprocess.PIPE, stdout=log, stderr=subprocess.STDOUT)
+        # confirm the verification message
+        process.stdin.write(b"\n")
+        process.stdin.close()
+
+        # the resource usage of the indexer includes its (waited for) index instances
+        pid, status, usage = os.wait4(process.pid, 0)
+        elapsed = timer() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0:
+        print("Elas4RDF error: indexing failed, see " + log_path)
+        sys.exit(-1)
+
+    # ru_maxrss is in KB
+    return elapsed, usage.ru_maxrss / 1024.0
+
+
+def run(name, work_dir, data_dir, triples, port, instances, base, ext, options):
+    config_path = os.path.join(work_dir, name + "-" + str(instances) + ".properties")
+    write_config(config_path, data_dir, port, instances, base, ext, options)
+
+    es_request(port, "/_bench/reset", "POST")
+    elapsed, peak_rss = run_indexer(work_dir, config_path, config_path + ".log")
+    stats = es_request(port, "/_bench/stats")
+
+    msearches = sum(count for key, count in stats["requests"].items() if key.endswith("/_msearch"))
+    result = {"index": name, "instances": instances, "triples": triples, "seconds": elapsed,
+              "triples_sec": triples / elapsed, "searches_triple": stats["searches"] / float(triples),
+              "msearches_triple": msearches / float(triples), "peak_rss_mb": peak_rss}
+
+    print("\t {:<9} instances: {:>2} | {:>9,.0f} triples/sec | {:.3f} searches/triple "
+          "({:.5f} msearch requests/triple) | peak RSS {:.0f} MB".format(
+        name, instances, result["triples_sec"], result["searches_triple"], result["msearches_triple"], peak_rss))
+    return result
+
+
+# lines of the .nt files of a directory
+def count_triples(data_dir):
+    triples = 0
+    for root, dirs, files in os.walk(data_dir):
+        for name in files:
+            if name.endswith(".nt"):
+                with open(os.path.join(root, name), "rb") as fp:
+                    triples += sum(1 for _ in fp)
+    return triples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='\'End-to-end ingestion benchmark (synthetic data, local ES)\'')
+    parser.add_argument('-triples', type=int, default=200000, help='"number of generated triples')
+    parser.add_argument('-files', type=int, default=4, help='"number of generated .nt files')
+    parser.add_argument('-data', help='"input directory (instead of generated data)')
+    parser.add_argument('-instances', default="1,2,4", help='"index.instances values (comma-separated)')
+    parser.add_argument('-search_latency', type=float, default=0, help='"latency of each (multi-)search, in ms')
+    parser.add_argument('-bulk_latency', type=float, default=0, help='"latency of each bulk request, in ms')
+    parser.add_argument('-port', type=int, default=9299, help='"port of the ES stand-in')
+    parser.add_argument('-set', action='append', default=[], help='"extra config line (key=value), repeatable')
+    parser.add_argument('-output', help='"write the results (JSON) to a file')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="elas4rdf-bench-")
+    # mappings are read from res/ (relative to the working dir)
+    os.symlink(os.path.join(os.path.abspath(ROOT), "res"), os.path.join(work_dir, "res"))
+
+    if args.data:
+        data_dir = os.path.abspath(args.data)
+        triples = count_triples(data_dir)
+    else:
+        data_dir = os.path.join(work_dir, "data")
+        triples = generate.generate(data_dir, args.triples, args.files)
+
+    print("Elas4RDF: benchmarking " + str(triples) + " triples (" + data_dir + "), work dir: " + work_dir)
+
+    results = []
+    for instances in [int(value) for value in args.instances.split(",")]:
+        # every run starts with empty indexes
+        es = start_es(args.port, args.search_latency, args.bulk_latency)
+        try:
+            results.append(run("baseline", work_dir, data_dir, triples, args.port, instances, True, False, args.set))
+            results.append(run("extended", work_dir, data_dir, triples, args.port, instances, False, True, args.set))
+        finally:
+            es.terminate()
+            es.wait()
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
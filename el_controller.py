@@ -1,11 +1,76 @@
-from elasticsearch import Elasticsearch, helpers
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from timeit import default_timer as timer
+
+from elasticsearch import Elasticsearch, TransportError, ConnectionTimeout
+from elasticsearch.connection_pool import RoundRobinSelector
+
+from index import metrics
+
+# orjson is optional - a faster encoder of the bulk docs
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 es = 0
 
+# client of the async engine (index.engine=async), bound to the event loop that created it
+async_es = None
+
+# hosts & connection options (elastic.* in -config), used by every client
+client_options = {}
+
+
+# an address of elastic.address - 'host' or 'http(s)://host'
+def host_entry(address, port):
+    scheme, sep, host = address.rpartition("://")
+    entry = {'host': host, 'port': port}
+    if scheme == "https":
+        entry['use_ssl'] = True
+    return entry
+
+
+# requests are spread over the hosts (round-robin), sniffing adds the other nodes of the cluster
+def new_client(client_class):
+    options = client_options
+    return client_class([host_entry(address, options['port']) for address in options['hosts']],
+                        timeout=300, maxsize=options['connections'], http_compress=options['compress'],
+                        selector_class=RoundRobinSelector, sniff_on_start=options['sniff'],
+                        sniff_on_connection_fail=options['sniff'], sniffer_timeout=60 if options['sniff'] else None)
+
+
+def init(hosts, port, connections=10, sniff=False, compress=False):
+    global es
+    global client_options
+    client_options = {'hosts': hosts, 'port': port, 'connections': connections, 'sniff': sniff,
+                      'compress': compress}
+    es = new_client(Elasticsearch)
+
 
-def init(host, port):
+# a new client for an index instance (Pool initializer) - the client (& its open connections)
+# of the parent process must not be shared by forked processes
+def init_worker():
     global es
-    es = Elasticsearch([{'host': host, 'port': port, 'timeout': 300}])
+    es = new_client(Elasticsearch)
+
+
+# AsyncElasticsearch (elasticsearch[async]) is only imported by the async engine
+def init_async():
+    from elasticsearch import AsyncElasticsearch
+    global async_es
+    async_es = new_client(AsyncElasticsearch)
+
+
+async def close_async():
+    global async_es
+    if async_es is not None:
+        await async_es.close()
+        async_es = None
 
 
 def search(index, size, q_json):
@@ -13,8 +78,295 @@ def search(index, size, q_json):
     return res
 
 
-def bulk_action(actions):
-    helpers.bulk(es, actions)
+def msearch(index, searches):
+    res = es.msearch(index=index, body=searches)
+    return res
+
+
+# bulk retries & dead-letter file (elastic.bulk.* in -config)
+bulk_options = {'adaptive': False, 'latency': 1.0, 'retries': 5, 'dead_letter': "dead_letter.ndjson"}
+
+# backoff of retried bulks (seconds) - exponential, capped & jittered
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# adaptive bulk sizes of the index instance, per configured bulk size
+bulk_sizes = {}
+dead_letter_lock = threading.Lock()
+
+
+def init_bulk(adaptive, latency, retries, dead_letter):
+    global bulk_options
+    bulk_options = {'adaptive': adaptive, 'latency': latency, 'retries': retries, 'dead_letter': dead_letter}
+
+
+# bulk size (docs) adapted to the observed bulk latency - shrinks when bulks are slower than the target
+# latency or rejected (429), grows when they are much faster, within [size / 10, size * 4]
+class BulkSize(object):
+    def __init__(self, size, target_latency, adaptive):
+        self.size = size
+        self.minimum = max(1, size // 10)
+        self.maximum = size * 4
+        self.target_latency = target_latency
+        self.adaptive = adaptive
+        self.lock = threading.Lock()
+
+    def observe(self, elapsed, rejected):
+        if not self.adaptive:
+            return
+        with self.lock:
+            if rejected:
+                self.size = max(self.minimum, self.size // 2)
+            elif elapsed > self.target_latency:
+                self.size = max(self.minimum, int(self.size * 0.8))
+            elif elapsed < self.target_latency / 2:
+                self.size = min(self.maximum, int(self.size * 1.2) + 1)
+
+
+def bulk_size(chunk_size):
+    if chunk_size not in bulk_sizes:
+        bulk_sizes[chunk_size] = BulkSize(chunk_size, bulk_options['latency'], bulk_options['adaptive'])
+    return bulk_sizes[chunk_size]
+
+
+def backoff(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+# whole bulk requests are retried on 429 (too many requests) & timeouts
+def retryable(error):
+    return isinstance(error, ConnectionTimeout) or (isinstance(error, TransportError) and error.status_code == 429)
+
+
+# bulk docs are NDJSON (action & source lines), UTF-8 encoded - as the ES client's serializer (compact,
+# non-ASCII characters kept), with orjson if available. Both encoders are strict, unlike the client's
+# 'surrogatepass' (which sent lone surrogates that ES rejects): the parser combines escaped surrogate
+# pairs & replaces lone surrogates (ntparser.unescape), so the text of the docs is always valid UTF-8
+if orjson is not None:
+    dumps = orjson.dumps
+else:
+    json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(data):
+        return json_encoder.encode(data).encode("utf-8")
+
+ACTION_END = b"}}\n"
+
+
+# the action line of the docs of an index, up to the doc id - encoded once & shared by all its docs
+def action_line(index_name):
+    return b'{"index":{"_index":' + dumps(index_name) + b',"_type":"_doc","_id":'
+
+
+# a bulk doc of an index action - its pre-encoded action line (action_line), id & source, without
+# building the action's dicts
+def index_doc(action, doc_id, source):
+    return b"".join((action, dumps(doc_id), ACTION_END, dumps(source), b"\n"))
+
+
+# the action line of the updates of an index, up to the doc id (as action_line)
+def update_line(index_name):
+    return b'{"update":{"_index":' + dumps(index_name) + b',"_type":"_doc","_id":'
+
+
+# concurrent updates of the same doc (by several index instances) are retried by ES
+UPDATE_END = b',"retry_on_conflict":10}}\n'
+
+
+# a bulk doc of an update action - its pre-encoded action line (update_line), id & body (script, upsert, ..)
+def update_doc(action, doc_id, body):
+    return b"".join((action, dumps(doc_id), UPDATE_END, dumps(body), b"\n"))
+
+
+# groups NDJSON docs into bulks of at most size.size docs & max_chunk_bytes - yields the bulks as lists of docs
+def batch_docs(docs, size, max_chunk_bytes):
+    bulk = []
+    bulk_bytes = 0
+    for doc in docs:
+        doc_bytes = len(doc)
+        if len(bulk) != 0 and (len(bulk) >= size.size or bulk_bytes + doc_bytes > max_chunk_bytes):
+            metrics.add("bulk_bytes", bulk_bytes)
+            yield bulk
+            bulk = []
+            bulk_bytes = 0
+        bulk.append(doc)
+        bulk_bytes += doc_bytes
+
+    if len(bulk) != 0:
+        metrics.add("bulk_bytes", bulk_bytes)
+        yield bulk
+
+
+# splits the docs of a bulk response - returns (success, rejected docs, failed (doc, status, error))
+def bulk_result(docs, res):
+    metrics.add("bulk_requests")
+    metrics.add("bulk_docs", len(docs))
+    if not res["errors"]:
+        return len(docs), [], []
+
+    success, rejected, failed = 0, [], []
+    for doc, item in zip(docs, res["items"]):
+        result = next(iter(item.values()))
+        status = result.get("status", 500)
+        if 200 <= status < 300:
+            success += 1
+        elif status == 429:
+            rejected.append(doc)
+        else:
+            failed.append((doc, status, result.get("error")))
+    metrics.add("rejected", len(rejected))
+    return success, rejected, failed
+
+
+# docs that could not be indexed are appended to the dead-letter file - one JSON object per line:
+# {"status": .., "error": .., "action": .., "source": ..}
+def dead_letter(failed):
+    if len(failed) == 0:
+        return 0
+
+    lines = []
+    for doc, status, error in failed:
+        action, sep, source = doc.rstrip(b"\n").partition(b"\n")
+        lines.append(b'{"status": ' + dumps(status) + b', "error": ' + dumps(error) +
+                     b', "action": ' + action + b', "source": ' + (source or b"null") + b'}\n')
+
+    # a single write per bulk (UTF-8, as the docs), index instances append to the same file
+    with dead_letter_lock:
+        with open(bulk_options['dead_letter'], "ab") as fp:
+            fp.write(b"".join(lines))
+    metrics.add("failed", len(failed))
+    return len(failed)
+
+
+# the outcome of a sent bulk - its response (res) or the transport error of the request: rejected docs are
+# retried & docs that fail permanently are dead-lettered, retryable errors of the whole bulk retry all of its
+# docs - returns (success, failed, docs to retry), no docs to retry once the bulk is done. Shared by the sync
+# & async senders, that only send the bulks & sleep (backoff) between the attempts
+def bulk_outcome(docs, res, error, attempt, size, elapsed):
+    if error is not None:
+        if not retryable(error) or attempt >= bulk_options['retries']:
+            raise error
+        size.observe(elapsed, True)
+        metrics.add("rejected", len(docs))
+        metrics.add("retries", len(docs))
+        return 0, 0, docs
+
+    metrics.add_time("send", elapsed)
+    success, rejected, permanent = bulk_result(docs, res)
+    size.observe(elapsed, len(rejected) != 0)
+    failed = dead_letter(permanent)
+
+    if len(rejected) != 0 and attempt >= bulk_options['retries']:
+        return success, failed + dead_letter([(doc, 429, "rejected, retries exhausted") for doc in rejected]), []
+    metrics.add("retries", len(rejected))
+    return success, failed, rejected
+
+
+# sends a bulk, until all of its docs are indexed or dead-lettered (bulk_outcome) - returns (success, failed) docs
+def send_bulk(docs, size):
+    success, failed = 0, 0
+    attempt = 0
+    while True:
+        start = timer()
+        res, error = None, None
+        try:
+            res = es.bulk(body=b"".join(docs))
+        except TransportError as e:
+            error = e
+
+        s, f, docs = bulk_outcome(docs, res, error, attempt, size, timer() - start)
+        success, failed = success + s, failed + f
+        if len(docs) == 0:
+            return success, failed
+
+        attempt += 1
+        time.sleep(backoff(attempt))
+
+
+# streams NDJSON docs (index_doc, or exported shards) to ES in bulks of at most chunk_size docs (adapted,
+# if elastic.bulk.adaptive) & max_chunk_bytes, sent by threads while the docs are still being generated
+# - returns (success, failed) docs
+def bulk_docs(docs, chunk_size=500, max_chunk_bytes=10 * 1024 * 1024, threads=2):
+    success, failed = 0, 0
+    size = bulk_size(chunk_size)
+    with ThreadPoolExecutor(threads) as executor:
+        pending = set()
+        for bulk in batch_docs(docs, size, max_chunk_bytes):
+            # at most threads bulks in flight
+            if len(pending) >= threads:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    s, f = future.result()
+                    success, failed = success + s, failed + f
+            pending.add(executor.submit(send_bulk, bulk, size))
+
+        for future in pending:
+            s, f = future.result()
+            success, failed = success + s, failed + f
+    return success, failed
+
+
+async def async_msearch(index, searches):
+    res = await async_es.msearch(index=index, body=searches)
+    return res
+
+
+# async send_bulk
+async def async_send_bulk(docs, size):
+    success, failed = 0, 0
+    attempt = 0
+    while True:
+        start = timer()
+        res, error = None, None
+        try:
+            res = await async_es.bulk(body=b"".join(docs))
+        except TransportError as e:
+            error = e
+
+        s, f, docs = bulk_outcome(docs, res, error, attempt, size, timer() - start)
+        success, failed = success + s, failed + f
+        if len(docs) == 0:
+            return success, failed
+
+        attempt += 1
+        await asyncio.sleep(backoff(attempt))
+
+
+# sends NDJSON docs to ES in bulks of at most chunk_size docs & max_chunk_bytes - returns (success, failed) docs
+async def async_bulk(docs, chunk_size=500, max_chunk_bytes=10 * 1024 * 1024):
+    success, failed = 0, 0
+    size = bulk_size(chunk_size)
+    for bulk in batch_docs(docs, size, max_chunk_bytes):
+        s, f = await async_send_bulk(bulk, size)
+        success, failed = success + s, failed + f
+    return success, failed
+
+
+# hits of a slice (slice_id of slices) of an index, in pages of at most size hits - sliced scroll in _doc order
+def scroll_slice(index_name, query, slice_id, slices, size, keep_alive="5m"):
+    body = {"query": query, "sort": ["_doc"]}
+    if slices > 1:
+        body["slice"] = {"id": slice_id, "max": slices}
+    res = es.search(index=index_name, body=body, size=size, scroll=keep_alive)
+    scroll_id = res.get("_scroll_id")
+    try:
+        while len(res["hits"]["hits"]) != 0:
+            yield res["hits"]["hits"]
+            res = es.scroll(scroll_id=scroll_id, scroll=keep_alive)
+            scroll_id = res.get("_scroll_id", scroll_id)
+    finally:
+        if scroll_id is not None:
+            es.clear_scroll(scroll_id=scroll_id, ignore=[404])
+
+
+def shard_count(index_name):
+    res = es.indices.get_settings(index=index_name)
+    return int(next(iter(res.values()))["settings"]["index"]["number_of_shards"])
+
+
+def creation_date(index_name):
+    res = es.indices.get_settings(index=index_name)
+    return next(iter(res.values()))["settings"]["index"].get("creation_date", "")
 
 
 def create_index(index_name, index_settings):
@@ -25,6 +377,37 @@ def delete_index(index_name):
     es.indices.delete(index=index_name, ignore=[400, 404])
 
 
+# deletes the docs matching a query - blocks until done, can take long on large indexes
+def delete_by_query(index_name, query):
+    res = es.delete_by_query(index=index_name, body={"query": query}, conflicts="proceed",
+                             request_timeout=24 * 3600)
+    return res["deleted"]
+
+
+# updates the docs matching a query with a (stored) script - blocks until done, can take long on large indexes
+def update_by_query(index_name, query, script):
+    res = es.update_by_query(index=index_name, body={"query": query, "script": script},
+                             request_timeout=24 * 3600)
+    return res["updated"] + res["deleted"]
+
+
+def put_script(script_id, source):
+    es.put_script(id=script_id, body={"script": {"lang": "painless", "source": source}})
+
+
+def put_settings(index_name, index_settings):
+    es.indices.put_settings(index=index_name, body=index_settings)
+
+
+def refresh(index_name):
+    es.indices.refresh(index=index_name)
+
+
+# blocks until merged - can take long on large indexes
+def force_merge(index_name, max_num_segments):
+    es.indices.forcemerge(index=index_name, max_num_segments=max_num_segments, request_timeout=24 * 3600)
+
+
 def count_docs(index_name):
     return int(es.cat.count(index=index_name).split(" ")[2])
 
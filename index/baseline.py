@@ -1,165 +1,180 @@
-import glob
 import os
-import re
-import time
-from pathlib import Path
 from timeit import default_timer as timer
-from multiprocessing import Pool, Manager
 
 import elasticsearch
 import el_controller
-from index import print_message
+from index import print_message, prop_store, chunks, ntparser, checkpoint, manifest, metrics, export, namespaces, \
+    entity, progress, schedule, pipeline
+
+
+# bulk doc of the n-th subject run of a chunk (index.entity) - merged into the entity-doc of its subject, across
+# files (a doc per subject, but per file for blank nodes)
+def entity_action(action, run, unit, n, scope, source):
+    doc_id = ntparser.doc_id(run.subject)
+    if run.subject.startswith("_:"):
+        doc_id = ntparser.doc_id(scope, run.subject)
+    script = {"id": entity.MERGE_SCRIPT_ID, "params": run.merge_params(entity.run_key(scope, unit, n), source)}
+    return el_controller.update_doc(action, doc_id, {"scripted_upsert": True, "script": script, "upsert": {}})
+
+
+# generates the index actions (triple-docs, property-docs & entity-docs) of a chunk (path, start, end)
+# of an input file, as bulk docs (el_controller.index_doc)
+def baseline_actions(unit, store):
+    # ext_fields: property URI -> field-prop name
+    prop_fields = {v: k for k, v in config.ext_fields.items()}
+
+    # action lines, encoded once
+    base_line = el_controller.action_line(config.base_index)
+    prop_lines = {field_prop: el_controller.action_line(field_prop) for field_prop in config.ext_fields.keys()}
+    entity_line = el_controller.update_line(config.entity_index)
+
+    # docs are tagged with their file, if a manifest is kept (index.manifest) - the ids of blank node
+    # triples are scoped to their file in any case
+    scope = manifest.source(unit[0], config.rdf_dir)
+    source = ""
+    id_terms = ()
+    if config.manifest:
+        source = scope
+        id_terms = (source,)
+
+    # the subject run of the entity-doc being built (index.entity) & the runs of the chunk
+    run = None
+    runs = 0
+
+    for lines in pipeline.unit_batches(unit, config):
+        start = timer()
+        actions = []
+        triples = 0
+        for line in lines:
+            triple = ntparser.parse_line(line)
 
+            # not a valid .nt line
+            if triple is None:
+                continue
+            triples += 1
 
-# extract name-space from an input URI
-def get_name_space(triple_part, pred_flag):
-    if pred_flag:
-        n_space = triple_part.rsplit('#', 1)[0]
-    else:
-        n_space = triple_part.rsplit('/', 1)[0]
+            subject, predicate, obj, sub_keywords, sub_nspace, pred_keywords, pred_nspace, obj_keywords, obj_nspace = \
+                triple
 
-    return n_space
+            # entity-doc of the subject run, emitted when the subject changes
+            if config.entity:
+                if run is None or run.subject != subject:
+                    if run is not None:
+                        actions.append(entity_action(entity_line, run, unit, runs, scope, source))
+                        runs += 1
+                    run = entity.Entity(subject, sub_keywords, sub_nspace)
+                run.add(pred_keywords, pred_nspace, obj_keywords, obj_nspace)
 
+            if not config.base:
+                continue
 
-# is a prefix included in uri
-def contains_prefix(uri):
-    return uri.rsplit(':', 1)[0].__contains__(":")
+            # if predicate-property is included in ext_fields - build properties indexes
+            if config.prop and predicate in prop_fields:
 
+                # get field-prop name
+                field_prop = prop_fields[predicate]
 
-# main method for indexing - accepts an input file
-def baseline_index(input_file):
-    # bulk config - empirically set to 3500
-    bulk_size = 3500
-    prop_bulk_size = 3500
-    bulk_actions = []
-    prop_bulk_actions = []
-    global config
+                # subjects with properties are resources (index.ext.namespaces.discover)
+                if config.ext_discover and sub_nspace:
+                    discovered[sub_nspace] = discovered.get(sub_nspace, 0) + 1
 
-    if (config.verbose):
-        print("\t " + input_file + ": started")
+                # store the property value locally
+                if store is not None:
+                    store.add(sub_keywords, field_prop, obj_keywords, source)
 
-    with open(input_file) as fp:
+                if config.prop_index:
+                    # create a property - document
+                    prop_doc = {"resource_terms": sub_keywords, field_prop: obj_keywords}
+                    if source:
+                        prop_doc["sourceFile"] = source
 
-        line = fp.readline()
-        while line:
+                    # add insert action
+                    actions.append(el_controller.index_doc(
+                        prop_lines[field_prop], ntparser.doc_id(*id_terms, sub_keywords, obj_keywords), prop_doc))
 
-            # not a valid .nt line
-            if "<" not in line:
-                line = fp.readline()
-                continue
+            # create a triple - document
+            doc = {"subjectKeywords": sub_keywords, "predicateKeywords": pred_keywords,
+                   "objectKeywords": obj_keywords, "subjectNspaceKeys": sub_nspace,
+                   "predicateNspaceKeys": pred_nspace, "objectNspaceKeys": obj_nspace}
+            if source:
+                doc["sourceFile"] = source
 
-            line = line.replace("<", "").replace(">", "").replace("\n", "")
-            contents = line.split(" ", 2)
+            # add insert action
+            actions.append(el_controller.index_doc(
+                base_line, ntparser.triple_id(id_terms, scope, subject, predicate, obj), doc))
 
-            if len(contents) < 3:
-                line = fp.readline()
-                continue
+        metrics.add_time("parse", timer() - start)
+        metrics.add("triples", triples)
+        progress.add(0, triples)
 
-            # handle subject
-            if contains_prefix(contents[0]):
-                split_prefix = contents[0].rsplit(':', 1)
-                sub_keywords = split_prefix[0].split("/")[-1] + ":" + split_prefix[1]
-                sub_nspace = ''.join(re.split("(/)", split_prefix[0])[:-1])
-            else:
-                sub_keywords = contents[0].rsplit('/', 1)[-1].replace(":", "")
-                sub_nspace = get_name_space(contents[0], False)
-
-            # handle predicate
-            if "#" not in contents[1]:
-                pred_keywords = contents[1].rsplit('/', 1)[-1].replace(":", "")
-                pred_nspace = get_name_space(contents[1], False)
-            else:
-                pred_keywords = contents[1].rsplit('#', 1)[-1].replace(":", "")
-                pred_nspace = get_name_space(contents[1], True)
-
-            # handle object
-            if "\"" in contents[2]:
-                obj_keywords = contents[2].replace("\"", " ")[:-2]
-                obj_nspace = ""
-            elif "/" in contents[2]:
-                if contains_prefix(contents[2]):
-                    split_prefix = contents[2].rsplit(':', 1)
-                    obj_keywords = split_prefix[0].split("/")[-1] + ":" + split_prefix[1][:-2]
-                    obj_nspace = ''.join(re.split("(/)", split_prefix[0])[:-1])
-                else:
-                    obj_keywords = contents[2].rsplit('/', 1)[-1].replace(":", "")[:-2]
-                    obj_nspace = get_name_space(contents[2], False)
-            elif "#" in contents[2]:
-                obj_keywords = contents[2].rsplit('#', 1)[-1].replace(":", "")[:-2]
+        # actions are generated per batch of lines (parsing is timed)
+        for action in actions:
+            yield action
 
-            # if predicate-property is included in ext_fields - build properties indexes
-            if config.prop and contents[1] in config.ext_fields.values():
+    # the last subject run of the chunk
+    if run is not None:
+        yield entity_action(entity_line, run, unit, runs, scope, source)
 
-                # get field-prop name
-                field_prop = {v: k for k, v in config.ext_fields.items()}[contents[1]]
 
-                # create a property - document
-                prop_doc = {"resource_terms": sub_keywords, field_prop: obj_keywords}
+# main method for indexing - accepts a chunk (path, start, end) of an input file, returns the chunk,
+# whether it was fully indexed, the stage metrics, the discovered namespaces & the elapsed time
+def baseline_index(unit):
+    start = timer()
+    input_file = unit[0]
+    completed = True
+    global config
+
+    if (config.verbose):
+        print("\t " + chunks.describe(unit) + ": started")
+
+    # local property store (if enabled)
+    store = None
+    if config.base and config.prop and config.prop_store:
+        store = prop_store.PropertyStore(config.prop_store)
+
+    # stream the actions to ES in bulks (as indicated in elastic.bulk.* in -config), or to the shards
+    # of an offline export (index.export)
+    try:
+        if config.export:
+            success, failed = export.export_docs(
+                baseline_actions(unit, store), export.shard_prefix(config.export, "baseline", unit, config.rdf_dir),
+                config.export_shard_bytes, config.export_compress)
+        else:
+            success, failed = el_controller.bulk_docs(baseline_actions(unit, store), config.bulk_size,
+                                                      config.bulk_bytes, config.bulk_threads)
+        # failed docs are recorded in the dead-letter file, the chunk is not indexed again
+        if failed != 0:
+            print("Elas4RDF: " + str(failed) + " docs could not be indexed (see " + config.dead_letter +
+                  "), in file: " + input_file)
+
+    except elasticsearch.ElasticsearchException as es:
+        completed = False
+        print("Elas4RDF: Exception occured (skipping rest of chunk), in file: " + chunks.describe(unit))
+        if (config.verbose):
+            print(str(es))
+
+    if store is not None:
+        store.close()
+
+    progress.flush()
 
-                # add insert action
-                prop_action = {
-                    "_index": field_prop,
-                    '_op_type': 'index',
-                    "_type": "_doc",
-                    "_source": prop_doc
-                }
+    if (config.verbose):
+        print("\t " + chunks.describe(unit) + ": finished")
 
-                prop_bulk_actions.append(prop_action)
-                if len(prop_bulk_actions) > prop_bulk_size:
-                    el_controller.bulk_action(prop_bulk_actions)
-                    del prop_bulk_actions[0:len(prop_bulk_actions)]
+    unit_namespaces = dict(discovered)
+    discovered.clear()
 
-            # create a triple - document
-            doc = {"subjectKeywords": sub_keywords, "predicateKeywords": pred_keywords,
-                   "objectKeywords": obj_keywords, "subjectNspaceKeys": sub_nspace,
-                   "predicateNspaceKeys": pred_nspace, "objectNspaceKeys": obj_nspace}
+    return unit, completed, metrics.take(), unit_namespaces, timer() - start
 
-            try:
-                # add insert action
-                action = {
-                    "_index": config.base_index,
-                    '_op_type': 'index',
-                    "_type": "_doc",
-                    "_source": doc
-                }
-
-                bulk_actions.append(action)
-                if len(bulk_actions) > bulk_size:
-                    el_controller.bulk_action(bulk_actions)
-                    del bulk_actions[0:len(bulk_actions)]
-
-            except elasticsearch.ElasticsearchException as es:
-
-                print("Elas4RDF: Exception occured (skipping line), in file: " + input_file)
-                if (config.verbose):
-                    print(str(es))
-            finally:
-                line = fp.readline()
-            ####
-
-    # flush any action that is left inside the bulk actions
-    el_controller.bulk_action(bulk_actions)
-    el_controller.bulk_action(prop_bulk_actions)
-
-    global finished_files
-    global total_files
-    finished_files.append(input_file)
 
-    # print progress information
-    if len(finished_files) == len(total_files):
-        p_str = ""
-        end = "\n"
-        time.sleep(5)
-    else:
-        p_str = "\r"
-        end = ""
-    print("\t Files : " + str(len(finished_files)) + " / " +
-          str(len(total_files)) + " , triples indexed: " + str(
-        el_controller.count_docs(config.base_index)) + p_str,
-          end=end)
+# namespaces of the subjects with properties, per index instance (index.ext.namespaces.discover)
+discovered = {}
 
-    if (config.verbose):
-        print("\t " + input_file + ": finished")
+
+# initialize an index instance - creates its ES client (none for an offline export)
+def init_instance():
+    if not config.export:
+        el_controller.init_worker()
 
 
 def controller(config_f):
@@ -168,32 +183,83 @@ def controller(config_f):
 
     rdf_dir = config.rdf_dir
 
-    # count.nt files
+    # list all .nt files (plain or compressed) of input RDF_DIR
     global total_files
-    total_files = []
-    for path in Path(rdf_dir).rglob('*.nt'):
-        total_files.append(str(path.absolute()))
+    total_files = chunks.list_files(rdf_dir)
 
     if len(total_files) == 0:
-        print('Elas4RDF error: No RDF files (.nt) found in the specified folder')
+        print('Elas4RDF error: No RDF files (.nt, .nt.gz, .nt.bz2, .nt.zst) found in the specified folder')
         exit(-1)
 
-    print_message.baseline_starting(config, str(len(total_files)))
+    all_files = total_files
+
+    # only new & changed files (delta run)
+    if config.delta_files is not None:
+        all_files = [path for path in all_files if path in config.delta_files]
+
+    # split files into chunks (as indicated in index.chunk_size in -config)
+    # (at subject boundaries, for the entity-docs of index.entity)
+    total_units = chunks.plan(all_files, config.chunk_size, config.entity)
 
-    # list all .nt files of input RDF_DIRs
-    all_files = glob.glob(rdf_dir + '/**/*.nt', recursive=True)
+    print_message.baseline_starting(config, str(len(all_files)) + ", chunks : " + str(len(total_units)))
+
+    # skip chunks indexed by an interrupted run (if resumed)
+    state = checkpoint.Checkpoint(config.state_file, "baseline")
+    pending_units = [unit for unit in total_units if not state.is_done(unit)]
+    if len(pending_units) != len(total_units):
+        print("\t resuming, chunks already indexed: " + str(len(total_units) - len(pending_units)))
+        total_units = pending_units
+
+    # dispatch the longest chunks first (as recorded in index.schedule by the previous runs)
+    scheduled = schedule.Schedule(config.schedule_file, "baseline")
+    pending_units = scheduled.order(pending_units, chunks.describe, lambda unit: unit[2] - unit[1])
 
     start = timer()
 
-    # deploy index instances (as indicated in index.instances in -config)
-    manager = Manager()
-    global finished_files
-    finished_files = manager.list()
-    p = Pool(config.instances)
-    p.map(baseline_index, all_files)
+    # (re)create the local property store - kept if resumed or by a delta run
+    if config.base and config.prop and config.prop_store and not ((config.resume or config.delta)
+                                                  and prop_store.exists(config.prop_store)):
+        prop_store.create(config.prop_store)
+
+    # deploy index instances (as indicated in index.instances or index.pipeline in -config), their
+    # progress is shown while waiting - the input bytes of the chunks
+    progress.init()
+    shown = progress.Progress(len(pending_units), sum(end - begin for _, begin, end in pending_units))
+    p = pipeline.instances(config, init_instance)
+    all_completed = True
+    # discovered namespaces - added to those of the interrupted run (if resumed) or kept by a delta run
+    discovered_counts = {}
+    if config.base and config.ext_discover and (config.resume or config.delta):
+        discovered_counts = namespaces.load(config.ext_discover)
+    results = p.imap_unordered(baseline_index, pending_units, chunksize=1)
+    for unit, completed, stats, unit_namespaces, elapsed in progress.results(results, shown):
+        metrics.merge("baseline", stats)
+        namespaces.merge(discovered_counts, unit_namespaces)
+        if completed:
+            state.mark_done(unit)
+            scheduled.record(chunks.describe(unit), elapsed)
+        else:
+            all_completed = False
+    p.close()
+    p.join()
+
+    if config.base and config.prop and config.prop_store:
+        prop_store.finalize(config.prop_store, config.resume)
+
+    if config.base and config.ext_discover:
+        namespaces.save(config.ext_discover, discovered_counts)
 
     end = timer()
 
     # get final number of docs & print message
-    docs_b = el_controller.count_docs(config.base_index)
-    print_message.baseline_finised(config, str((end - start)), docs_b)
+    if config.export:
+        triples = metrics.totals.get("baseline", {"counters": {}})["counters"].get("triples", 0)
+        print_message.export_finished(config, "baseline", str((end - start)), triples)
+    else:
+        if config.base:
+            docs_b = el_controller.count_docs(config.base_index)
+            print_message.baseline_finised(config, str((end - start)), docs_b)
+        if config.entity:
+            print_message.entity_finished(config, str((end - start)), el_controller.count_docs(config.entity_index))
+
+    return all_completed
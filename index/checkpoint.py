@@ -0,0 +1,63 @@
+import json
+import os
+
+# progress of an indexing run - the chunks (path, start, end) already indexed by each indexing
+# process (baseline, extended), kept in a local state file so that an interrupted run can be resumed
+#
+# a chunk is only skipped if its file is unchanged (same size & modification time) - chunks that were
+# partially indexed are indexed again, their docs are overwritten since doc ids are stable
+
+
+# start a new run - drop the progress of any previous one
+def reset(path):
+    if os.path.isfile(path):
+        os.remove(path)
+
+
+def load(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def unit_key(unit):
+    path, start, end = unit
+    stat = os.stat(path)
+    return path + ":" + str(start) + ":" + str(end) + ":" + str(stat.st_size) + ":" + str(stat.st_mtime_ns)
+
+
+class Checkpoint(object):
+    def __init__(self, path, process):
+        self.path = path
+        self.process = process
+        self.state = load(path)
+        self.state[process] = self.state.get(process, [])
+        self.done = set(self.state[process])
+        self.save()
+
+    def is_done(self, unit):
+        return self.has(unit_key(unit))
+
+    def mark_done(self, unit):
+        self.add(unit_key(unit))
+
+    # any other step of the process (e.g. the docs of a file deleted by a delta run)
+    def has(self, key):
+        return key in self.done
+
+    def add(self, key):
+        self.add_all([key])
+
+    # several steps at once, saved once
+    def add_all(self, keys):
+        keys = [key for key in keys if key not in self.done]
+        self.done.update(keys)
+        self.state[self.process].extend(keys)
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(self.state, fp)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,191 @@
+import bz2
+import glob
+import gzip
+import io
+import os
+import queue
+import threading
+
+from index import progress
+
+# zstandard is optional, only needed for .nt.zst input files
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# splits the input .nt files at newline boundaries into byte-range chunks - (path, start, end)
+# units of work that index instances process independently
+#
+# compressed files (.nt.gz, .nt.bz2, .nt.zst) are streamed & decompressed while read, they
+# cannot be split - each one is a single chunk
+
+EXTENSIONS = (".nt", ".nt.gz", ".nt.bz2", ".nt.zst")
+COMPRESSED = (".gz", ".bz2", ".zst")
+
+# decompressed blocks read ahead by a decompression thread
+BLOCK_SIZE = 1024 * 1024
+READ_AHEAD = 8
+
+# bytes read before the reached offset is added to the progress
+REPORT_BYTES = 64 * 1024
+
+
+# all input files of a directory (recursively)
+def list_files(rdf_dir):
+    files = []
+    for extension in EXTENSIONS:
+        files.extend(glob.glob(rdf_dir + '/**/*' + extension, recursive=True))
+    return sorted(files)
+
+
+def is_compressed(path):
+    return path.endswith(COMPRESSED)
+
+
+# subject (first term) of an .nt line
+def line_subject(line):
+    terms = line.split(None, 1)
+    return terms[0] if terms else b""
+
+
+# plan the chunks of all files, chunk_size <= 0 keeps each file whole - with subject_runs, chunks
+# end at a subject boundary, the consecutive triples of a subject are kept in the same chunk
+def plan(files, chunk_size, subject_runs=False):
+    units = []
+    for path in files:
+        size = os.path.getsize(path)
+        if chunk_size <= 0 or size <= chunk_size or is_compressed(path):
+            units.append((path, 0, size))
+            continue
+
+        with open(path, "rb") as fp:
+            start = 0
+            while start < size:
+                end = start + chunk_size
+                if end >= size:
+                    end = size
+                else:
+                    # move the boundary to the end of the current line
+                    fp.seek(end)
+                    fp.readline()
+                    end = fp.tell()
+                    if subject_runs:
+                        end = run_end(fp, size)
+                units.append((path, start, end))
+                start = end
+
+    return units
+
+
+# end of the subject run of the line at the current position - the start of the first line with another subject
+def run_end(fp, size):
+    subject = None
+    while True:
+        pos = fp.tell()
+        line = fp.readline()
+        if not line:
+            return size
+        if subject is not None and line_subject(line) != subject:
+            return pos
+        subject = line_subject(line)
+
+
+def decode_line(line):
+    if line.endswith(b"\r\n"):
+        line = line[:-2] + b"\n"
+    return line.decode("utf-8")
+
+
+# lines of a chunk - compressed files are optionally decompressed by a separate thread
+def read_lines(unit, threaded=False):
+    path, start, end = unit
+    if is_compressed(path):
+        with open_compressed(path) as stream:
+            lines = threaded_lines(stream) if threaded else stream
+            for line in lines:
+                yield decode_line(line)
+        progress.add(end - start, 0)
+        return
+
+    with open(path, "rb") as fp:
+        fp.seek(start)
+        pos = start
+        # byte offsets reached are added to the progress
+        reported = start
+        while pos < end:
+            line = fp.readline()
+            if not line:
+                break
+            pos += len(line)
+            if pos - reported >= REPORT_BYTES:
+                progress.add(pos - reported, 0)
+                reported = pos
+            yield decode_line(line)
+        progress.add(pos - reported, 0)
+
+
+def describe(unit):
+    path, start, end = unit
+    return path + " [" + str(start) + ":" + str(end) + "]"
+
+
+# decompressed (binary) stream of a file - multi-member gzip & multi-stream bz2 files are read whole
+def open_compressed(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if zstandard is None:
+        raise ImportError("reading " + path + " requires the zstandard package")
+    fp = open(path, "rb")
+    reader = zstandard.ZstdDecompressor().stream_reader(fp, read_across_frames=True, closefd=True)
+    return io.BufferedReader(reader, BLOCK_SIZE)
+
+
+# decompression (zlib, bz2 & zstd release the GIL) runs in a separate thread, overlapping with parsing
+def threaded_lines(stream):
+    blocks = queue.Queue(READ_AHEAD)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_blocks, args=(stream, blocks, stop), daemon=True)
+    reader.start()
+
+    try:
+        rest = b""
+        while True:
+            block = blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                break
+            lines = (rest + block).split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+        if rest:
+            yield rest
+    finally:
+        # the consumer may stop early - release the reader
+        stop.set()
+        reader.join()
+
+
+def read_blocks(stream, blocks, stop):
+    try:
+        while True:
+            block = stream.read(BLOCK_SIZE)
+            if not put_block(blocks, block, stop) or not block:
+                break
+    except Exception as e:
+        put_block(blocks, e, stop)
+
+
+# waits for room in the queue, unless the consumer stopped
+def put_block(blocks, block, stop):
+    while not stop.is_set():
+        try:
+            blocks.put(block, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
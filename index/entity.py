@@ -0,0 +1,153 @@
+# entity-centric index (index.entity) - a doc per subject instead of a doc per triple, built by the baseline
+# pass from subject runs (consecutive triples of the same subject): its predicate & object keywords (multi-valued
+# fields) and the number of values of each predicate (predicateCounts)
+#
+# a subject is usually found in several files (DBpedia ships a file per dataset: labels, types, ..) - each subject
+# run is merged into the doc of its subject by a scripted upsert (MERGE_SCRIPT): the runs are kept in the doc by key
+# (<file>@<chunk start>#<run of the chunk>, 'runs' - not indexed) & its fields are recomputed from all its runs, so a
+# run indexed again (resumed chunk) replaces itself and the runs of a changed or removed file are removed by a delta
+# run (REMOVE_SCRIPT). Chunks end at subject boundaries, the triples of a subject found again later in a file are
+# merged as well. Blank node labels are local to their file - their docs are not merged across files
+
+# stored scripts (put by the indexer & the loader, see el_controller.put_script)
+MERGE_SCRIPT_ID = "elas4rdf-entity-merge"
+REMOVE_SCRIPT_ID = "elas4rdf-entity-remove"
+
+# fields of the doc recomputed from its runs - same as merge()
+RECOMPUTE = """
+List pk = new ArrayList(); List pn = new ArrayList(); List ok = new ArrayList(); List on = new ArrayList();
+List sf = new ArrayList(); Map counts = new HashMap(); int triples = 0;
+for (String key : new TreeSet(runs.keySet())) {
+  Map run = runs[key];
+  for (String p : run['predicateKeywords']) {
+    if (!counts.containsKey(p)) { pk.add(p); counts[p] = 0; }
+    counts[p] = counts[p] + run['predicateCounts'][p];
+  }
+  for (String n : run['predicateNspaceKeys']) { if (!pn.contains(n)) { pn.add(n); } }
+  ok.addAll(run['objectKeywords']);
+  for (String n : run['objectNspaceKeys']) { if (!on.contains(n)) { on.add(n); } }
+  if (run['sourceFile'] != null && !sf.contains(run['sourceFile'])) { sf.add(run['sourceFile']); }
+  triples += (int) run['tripleCount'];
+}
+ctx._source.predicateKeywords = pk; ctx._source.predicateNspaceKeys = pn;
+ctx._source.objectKeywords = ok; ctx._source.objectNspaceKeys = on;
+ctx._source.predicateCounts = counts; ctx._source.tripleCount = triples;
+if (sf.isEmpty()) { ctx._source.remove('sourceFile'); } else { ctx._source.sourceFile = sf; }
+"""
+
+# adds (or replaces) a run of the doc - params: key, run, subjectKeywords, subjectNspaceKeys
+MERGE_SCRIPT = """
+Map runs = ctx._source.runs;
+if (runs == null) { runs = new HashMap(); ctx._source.runs = runs; }
+runs[params.key] = params.run;
+ctx._source.subjectKeywords = params.subjectKeywords;
+ctx._source.subjectNspaceKeys = params.subjectNspaceKeys;
+""" + RECOMPUTE
+
+# removes the runs of a file (update by query) - params: sourceFile, a doc without runs is deleted
+REMOVE_SCRIPT = """
+Map runs = ctx._source.runs;
+if (runs != null) {
+  for (String key : new ArrayList(runs.keySet())) {
+    if (params.sourceFile.equals(runs[key]['sourceFile'])) { runs.remove(key); }
+  }
+}
+if (runs == null || runs.isEmpty()) { ctx.op = 'delete'; } else {""" + RECOMPUTE + "}\n"
+
+SCRIPTS = {MERGE_SCRIPT_ID: MERGE_SCRIPT, REMOVE_SCRIPT_ID: REMOVE_SCRIPT}
+
+
+class Entity(object):
+    __slots__ = ("subject", "sub_keywords", "sub_nspace", "pred_keywords", "pred_nspace", "obj_keywords",
+                 "obj_nspace", "counts", "triples")
+
+    def __init__(self, subject, sub_keywords, sub_nspace):
+        self.subject = subject
+        self.sub_keywords = sub_keywords
+        self.sub_nspace = sub_nspace
+        self.pred_keywords = []
+        self.pred_nspace = []
+        self.obj_keywords = []
+        self.obj_nspace = []
+        self.counts = {}
+        self.triples = 0
+
+    def add(self, pred_keywords, pred_nspace, obj_keywords, obj_nspace):
+        count = self.counts.get(pred_keywords, 0)
+        if count == 0:
+            self.pred_keywords.append(pred_keywords)
+            if pred_nspace not in self.pred_nspace:
+                self.pred_nspace.append(pred_nspace)
+        self.counts[pred_keywords] = count + 1
+
+        # repeated object keywords are kept - term frequency
+        self.obj_keywords.append(obj_keywords)
+        if obj_nspace and obj_nspace not in self.obj_nspace:
+            self.obj_nspace.append(obj_nspace)
+        self.triples += 1
+
+    def doc(self):
+        return {"subjectKeywords": self.sub_keywords, "subjectNspaceKeys": self.sub_nspace,
+                "predicateKeywords": self.pred_keywords, "predicateNspaceKeys": self.pred_nspace,
+                "objectKeywords": self.obj_keywords, "objectNspaceKeys": self.obj_nspace,
+                "predicateCounts": self.counts, "tripleCount": self.triples}
+
+    # the params of the MERGE_SCRIPT update of the run - source is its sourceFile (if recorded)
+    def merge_params(self, key, source=""):
+        run = self.doc()
+        del run["subjectKeywords"]
+        del run["subjectNspaceKeys"]
+        if source:
+            run["sourceFile"] = source
+        return {"key": key, "run": run, "subjectKeywords": self.sub_keywords, "subjectNspaceKeys": self.sub_nspace}
+
+
+# key of the n-th subject run of a chunk (path, start, end) of a file (scope, its sourceFile)
+def run_key(scope, unit, n):
+    return scope + "@" + str(unit[1]) + "#" + str(n)
+
+
+# the fields of a doc recomputed from its runs (key -> run) - as the RECOMPUTE part of the scripts
+def merge(runs):
+    fields = {"predicateKeywords": [], "predicateNspaceKeys": [], "objectKeywords": [], "objectNspaceKeys": [],
+              "predicateCounts": {}, "tripleCount": 0}
+    counts = fields["predicateCounts"]
+    sources = []
+    for key in sorted(runs.keys()):
+        run = runs[key]
+        for pred in run["predicateKeywords"]:
+            if pred not in counts:
+                fields["predicateKeywords"].append(pred)
+                counts[pred] = 0
+            counts[pred] += run["predicateCounts"][pred]
+        for nspace in run["predicateNspaceKeys"]:
+            if nspace not in fields["predicateNspaceKeys"]:
+                fields["predicateNspaceKeys"].append(nspace)
+        fields["objectKeywords"].extend(run["objectKeywords"])
+        for nspace in run["objectNspaceKeys"]:
+            if nspace not in fields["objectNspaceKeys"]:
+                fields["objectNspaceKeys"].append(nspace)
+        if run.get("sourceFile") and run["sourceFile"] not in sources:
+            sources.append(run["sourceFile"])
+        fields["tripleCount"] += run["tripleCount"]
+    if sources:
+        fields["sourceFile"] = sources
+    return fields
+
+
+# the scripts applied to a doc (_source) - as MERGE_SCRIPT & REMOVE_SCRIPT, returns 'delete' if the doc
+# is to be deleted (for the tests & the benchmark's ES stand-in)
+def apply_script(script_id, source, params):
+    runs = source.setdefault("runs", {})
+    if script_id == MERGE_SCRIPT_ID:
+        runs[params["key"]] = params["run"]
+        source["subjectKeywords"] = params["subjectKeywords"]
+        source["subjectNspaceKeys"] = params["subjectNspaceKeys"]
+    else:
+        for key in [key for key, run in runs.items() if run.get("sourceFile") == params["sourceFile"]]:
+            del runs[key]
+        if len(runs) == 0:
+            return "delete"
+    source.pop("sourceFile", None)
+    source.update(merge(runs))
+    return "index"
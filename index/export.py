@@ -0,0 +1,141 @@
+import glob
+import gzip
+import io
+import json
+import os
+from timeit import default_timer as timer
+
+from index import chunks, metrics
+
+# offline export (index.export) - instead of sending them to ES, index instances write the bulk NDJSON
+# docs (action & source lines) of each chunk into compressed shards, rotated at index.export.shard_bytes
+# (uncompressed) - the shards are loaded into ES later by loader_service.py
+#
+# the shards of a chunk are named after it (<process>/<file>@<start>.<part>.ndjson.gz) & written under
+# a temporary name until complete, so a chunk exported again (e.g. resumed) replaces its shards and
+# the loader never reads a partial shard
+
+# index.export.compress -> shard extension
+COMPRESSION = {"gz": ".gz", "zst": ".zst", "none": ""}
+EXTENSIONS = (".ndjson", ".ndjson.gz", ".ndjson.zst")
+
+# the mappings of the exported indexes, created by the loader
+INDEXES_FILE = "indexes.json"
+
+GZIP_LEVEL = 6
+BLOCK_SIZE = 1024 * 1024
+
+# file name prefix of the shards of a chunk (path, start, end)
+def shard_prefix(directory, process, unit, rdf_dir):
+    path, start, end = unit
+    name = os.path.relpath(path, rdf_dir).replace(os.sep, "__")
+    return os.path.join(directory, process, name + "@" + str(start))
+
+
+def open_shard(path, compression):
+    if compression == "gz":
+        return gzip.open(path, "wb", compresslevel=GZIP_LEVEL)
+    if compression == "zst":
+        return chunks.zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+    return open(path, "wb", buffering=0)
+
+
+# shards of a chunk, rotated once shard_bytes (uncompressed) are written
+class ShardWriter(object):
+    def __init__(self, prefix, shard_bytes, compression):
+        self.prefix = prefix
+        self.shard_bytes = shard_bytes
+        self.compression = compression
+        self.part = 0
+        self.path = None
+        self.fp = None
+        self.written = 0
+
+    def write(self, data):
+        if self.fp is not None and self.written + len(data) > self.shard_bytes:
+            self.close()
+        if self.fp is None:
+            self.path = self.prefix + "." + str(self.part) + ".ndjson" + COMPRESSION[self.compression]
+            self.fp = io.BufferedWriter(open_shard(self.path + ".tmp", self.compression), BLOCK_SIZE)
+        self.fp.write(data)
+        self.written += len(data)
+
+    # completes the current shard
+    def close(self):
+        if self.fp is None:
+            return
+        self.fp.close()
+        os.replace(self.path + ".tmp", self.path)
+        self.fp = None
+        self.part += 1
+        self.written = 0
+
+
+# removes the shards (complete or not) of a previous export of a chunk
+def remove_shards(prefix):
+    for path in glob.glob(glob.escape(prefix) + ".*"):
+        os.remove(path)
+
+
+# writes the NDJSON docs of a chunk (el_controller.index_doc) into its shards - returns (success, failed)
+# docs, as el_controller.bulk_docs
+def export_docs(docs, prefix, shard_bytes, compression):
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    remove_shards(prefix)
+
+    writer = ShardWriter(prefix, shard_bytes, compression)
+    exported = 0
+    for doc in docs:
+        start = timer()
+        writer.write(doc)
+        metrics.add_time("write", timer() - start)
+        metrics.add("export_bytes", len(doc))
+        exported += 1
+
+    start = timer()
+    writer.close()
+    metrics.add_time("write", timer() - start)
+    metrics.add("exported", exported)
+    return exported, 0
+
+
+# all shards of an export directory (recursively)
+def list_shards(directory):
+    shards = []
+    for extension in EXTENSIONS:
+        shards.extend(glob.glob(directory + '/**/*' + extension, recursive=True))
+    return sorted(shards)
+
+
+# docs (action & source lines) of a shard - compressed shards are optionally decompressed by a separate thread
+def read_docs(path, threaded=False):
+    if chunks.is_compressed(path):
+        stream = chunks.open_compressed(path)
+    else:
+        stream = open(path, "rb")
+
+    with stream:
+        lines = chunks.threaded_lines(stream) if threaded and chunks.is_compressed(path) else iter(stream)
+        for line in lines:
+            # delete actions have no source line
+            if not line.startswith(b'{"delete"'):
+                line += next(lines)
+            yield line
+
+
+# the mappings of the exported indexes (name -> mapping) - indexes of earlier exports to the same
+# directory (e.g. baseline & extended exported separately) are kept
+def save_indexes(directory, indexes):
+    all_indexes = load_indexes(directory)
+    all_indexes.update(indexes)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, INDEXES_FILE), "w") as fp:
+        json.dump(all_indexes, fp, indent=4)
+
+
+def load_indexes(directory):
+    path = os.path.join(directory, INDEXES_FILE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as fp:
+        return json.load(fp)
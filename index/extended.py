@@ -1,35 +1,20 @@
-import glob
+import asyncio
 import os
-import re
 import time
-from pathlib import Path
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from timeit import default_timer as timer
-from multiprocessing import Pool, Manager
+from multiprocessing import Value, util
 
 import elasticsearch
 import el_controller
-from index import print_message
+from index import print_message, prop_store, chunks, ntparser, prop_cache, checkpoint, manifest, metrics, export, \
+    namespaces, prop_table, progress, schedule, pipeline
 
 
-def get_name_space(triple_part, pred_flag):
-    if pred_flag:
-        n_space = triple_part.rsplit('#', 1)[0]
-    else:
-        n_space = triple_part.rsplit('/', 1)[0]
-
-    return n_space
-
-
-def is_resource(full_uri):
-    for nspace in name_spaces:
-        if full_uri.__contains__(nspace):
-            return True
-    return False
-
-
-# if a prefix is included in uri
-def contains_prefix(uri):
-    return uri.rsplit(':', 1)[0].__contains__(":")
+# a namespace of a resource - starts with a known namespace (index.ext.namespaces)
+def is_resource(nspace):
+    return name_spaces.matches(nspace)
 
 
 def get_property(entity):
@@ -47,202 +32,667 @@ def get_property(entity):
         }
 
 
-def extended_index(input_file):
-    bulk_actions = []
-    bulk_size = 3500
-
-    if (config.verbose):
-        print("\t " + input_file + ": started")
-
-    with open(input_file) as fp:
-
-        prop_maps = {}
-
-        line = fp.readline()
-        while line:
-
-            if "<" not in line:
-                line = fp.readline()
+# resolve the properties of the given resources from the cache (or the local property store) - returns
+# the resources left to be searched, per property-index
+def resolve_local(keywords, resolved):
+    searches = {}
+    for prop_name in config.ext_fields.keys():
+        # the shared property table is read directly - values are not copied into a per-instance cache
+        if cache is None:
+            for k in keywords:
+                values = store.get(k, prop_name)
+                if values is not None:
+                    values = [" " + value for value in values]
+                resolved[k + "_" + prop_name] = values
+            metrics.add("lookups", len(keywords))
+            continue
+
+        missing = []
+        for k in keywords:
+            values = cache.get(k + "_" + prop_name, NOT_CACHED)
+            if values is NOT_CACHED:
+                missing.append(k)
+            else:
+                resolved[k + "_" + prop_name] = values
+        metrics.add("lookups", len(missing))
+
+        if store is not None:
+            for k in missing:
+                values = store.get(k, prop_name)
+                if values is not None:
+                    values = [" " + value for value in values]
+                resolved[k + "_" + prop_name] = values
+                cache.put(k + "_" + prop_name, values)
+            continue
+
+        searches[prop_name] = missing
+
+    return searches
+
+
+# multi-search body of a batch of resources
+def search_body(batch):
+    body = []
+    for k in batch:
+        body.append({})
+        body.append(dict(get_property(k), size=150))
+    metrics.add("searches")
+    return body
+
+
+# multi-search requests (body per batch of msearch_size resources) of the resources left to be searched
+def property_searches(searches):
+    for prop_name, missing in searches.items():
+        for i in range(0, len(missing), msearch_size):
+            batch = missing[i:i + msearch_size]
+            yield prop_name, batch, search_body(batch)
+
+
+# resolves the responses of a multi-search - returns the resources whose search was rejected (429, by the
+# search thread pool) to be searched again, the other failed searches are raised
+def resolve_responses(prop_name, batch, responses, resolved):
+    rejected = []
+    for k, res in zip(batch, responses):
+        status = res.get('status', 200)
+        if 'error' in res or status >= 300:
+            if status != 429:
+                raise elasticsearch.TransportError(status, "search_failed", res.get('error'))
+            rejected.append(k)
+            continue
+
+        values = None
+        if len(res['hits']['hits']) != 0:
+            values = [" " + prop_hit["_source"][prop_name] for prop_hit in res['hits']['hits']]
+        # misses (no hits) are cached as well (None), so they are not searched again
+        resolved[k + "_" + prop_name] = values
+        cache.put(k + "_" + prop_name, values)
+    return rejected
+
+
+# rejected searches are sent again (with backoff) up to elastic.bulk.retries times - returns the body of
+# the next multi-search, none once all the resources are resolved
+def retry_searches(rejected, attempt):
+    if len(rejected) == 0:
+        return None
+    if attempt >= config.bulk_retries:
+        raise elasticsearch.TransportError(429, "search_rejected", "searches rejected, retries exhausted")
+    metrics.add("search_retries", len(rejected))
+    return search_body(rejected)
+
+
+# resolve the properties of the given resources - from the cache, or with a single
+# multi-search request per property-index (or from the local property store)
+def resolve_properties(keywords):
+    start = timer()
+    resolved = {}
+    searches = resolve_local(keywords, resolved)
+    for prop_name, batch, body in property_searches(searches):
+        attempt = 0
+        while True:
+            prop_res = el_controller.msearch(prop_name, body)
+            batch = resolve_responses(prop_name, batch, prop_res['responses'], resolved)
+            body = retry_searches(batch, attempt)
+            if body is None:
+                break
+            attempt += 1
+            time.sleep(el_controller.backoff(attempt))
+
+    metrics.add_time("lookup", timer() - start)
+    return resolved
+
+
+def window_keywords(window):
+    keywords = set()
+    for doc_id, doc, resources in window:
+        for k, suffix in resources:
+            keywords.add(k)
+    return keywords
+
+
+# extended fields (field + suffix -> values) of a resource
+def resource_fields(k, suffix, resolved):
+    fields = {}
+    for prop_name in config.ext_fields.keys():
+        values = resolved[k + "_" + prop_name]
+        if values is not None:
+            fields[prop_name + suffix] = values
+    return fields
+
+
+# index actions (bulk docs) of a window of triple-docs, enriched with their (resolved) properties - consecutive
+# docs of the same subject (a subject run, as in dumps sorted by subject) share their '_sub' fields
+def window_actions(window, resolved):
+    start = timer()
+    action = el_controller.action_line(config.ext_index)
+    actions = []
+    run_subject = None
+    run_fields = None
+    runs = 0
+    for doc_id, doc, resources in window:
+        for k, suffix in resources:
+            if suffix == "_sub":
+                if k != run_subject:
+                    run_subject = k
+                    run_fields = resource_fields(k, suffix, resolved)
+                    runs += 1
+                doc.update(run_fields)
                 continue
 
-            line = line.replace("<", "").replace(">", "").replace("\n", "")
-            contents = line.split(" ", 2)
-
-            if len(contents) < 3:
-                line = fp.readline()
+            for prop_name in config.ext_fields.keys():
+                values = resolved[k + "_" + prop_name]
+                if values is not None:
+                    doc[prop_name + suffix] = values
+
+        # add insert action
+        actions.append(el_controller.index_doc(action, doc_id, doc))
+
+    metrics.add_time("serialize", timer() - start)
+    metrics.add("subject_runs", runs)
+    return actions
+
+
+# enrich a window of triple-docs with their properties - returns their index actions
+def enrich_window(window):
+    return window_actions(window, resolve_properties(window_keywords(window)))
+
+
+# resources (subject, predicate, object) of a triple-doc to be extended with their properties
+def doc_resources(doc):
+    resources = []
+    if config.ext_inc_sub:
+        resources.append((doc["subjectKeywords"], "_sub"))
+    if config.ext_inc_pre and is_resource(doc["predicateNspaceKeys"]):
+        resources.append((doc["predicateKeywords"], "_pre"))
+    if config.ext_inc_obj and is_resource(doc["objectNspaceKeys"]):
+        resources.append((doc["objectKeywords"], "_obj"))
+    return resources
+
+
+# windows of elastic.bulk.size triple-docs (doc_id, doc, resources) of a chunk (path, start, end) of an input file
+def triple_windows(unit):
+    window = []
+
+    # docs are tagged with their file, if a manifest is kept (index.manifest) - the ids of blank node
+    # triples are scoped to their file in any case
+    scope = manifest.source(unit[0], config.rdf_dir)
+    source = ""
+    id_terms = ()
+    if config.manifest:
+        source = scope
+        id_terms = (source,)
+
+    for lines in pipeline.unit_batches(unit, config):
+        # parsing is timed per batch of lines (without the enrichment of the windows)
+        start = timer()
+        triples = 0
+        for line in lines:
+            triple = ntparser.parse_line(line)
+
+            # not a valid .nt line
+            if triple is None:
                 continue
+            triples += 1
 
-            # handle subject
-            if contains_prefix(contents[0]):
-                split_prefix = contents[0].rsplit(':', 1)
-                sub_keywords = split_prefix[0].split("/")[-1] + ":" + split_prefix[1]
-                sub_nspace = ''.join(re.split("(/)", split_prefix[0])[:-1])
-            else:
-                sub_keywords = contents[0].rsplit('/', 1)[-1].replace(":", "")
-                sub_nspace = get_name_space(contents[0], False)
-
-            # handle predicate
-            if "#" not in contents[1]:
-                pre_keywords = contents[1].rsplit('/', 1)[-1].replace(":", "")
-                pre_nspace = get_name_space(contents[1], False)
-            else:
-                pre_keywords = contents[1].rsplit('#', 1)[-1].replace(":", "")
-                pre_nspace = get_name_space(contents[1], True)
-
-            # handle object
-            if "\"" in contents[2]:
-                obj_keywords = contents[2].replace("\"", " ")[:-2]
-                obj_nspace = ""
-            elif "/" in contents[2]:
-                if contains_prefix(contents[2]):
-                    split_prefix = contents[2].rsplit(':', 1)
-                    obj_keywords = split_prefix[0].split("/")[-1] + ":" + split_prefix[1][:-2]
-                    obj_nspace = ''.join(re.split("(/)", split_prefix[0])[:-1])
-                else:
-                    obj_keywords = contents[2].rsplit('/', 1)[-1].replace(":", "")[:-2]
-                    obj_nspace = get_name_space(contents[2], False)
-            elif "#" in contents[2]:
-                obj_keywords = contents[2].rsplit('#', 1)[-1].replace(":", "")[:-2]
+            subject, predicate, obj, sub_keywords, sub_nspace, pre_keywords, pre_nspace, obj_keywords, obj_nspace = \
+                triple
 
             # create elastic triple-doc
             doc = {"subjectKeywords": sub_keywords, "predicateKeywords": pre_keywords,
                    "objectKeywords": obj_keywords, "subjectNspaceKeys": sub_nspace,
                    "predicateNspaceKeys": pre_nspace, "objectNspaceKeys": obj_nspace}
+            if source:
+                doc["sourceFile"] = source
+
+            window.append((ntparser.triple_id(id_terms, scope, subject, predicate, obj), doc, doc_resources(doc)))
+            if len(window) >= config.bulk_size:
+                metrics.add_time("parse", timer() - start)
+                yield window
+                window = []
+                start = timer()
+
+        metrics.add_time("parse", timer() - start)
+        metrics.add("triples", triples)
+        progress.add(0, triples)
+
+    # flush any doc that is left inside the window
+    if len(window) != 0:
+        yield window
+
+
+# windows of the triple-docs of a scroll (pages of hits) - the extended fields of the docs (if read from the
+# extended index) are dropped, the docs are enriched again
+def hit_windows(pages):
+    ext_fields = [prop_name + suffix for prop_name in config.ext_fields.keys() for suffix in ("_sub", "_pre", "_obj")]
+    while True:
+        start = timer()
+        hits = next(pages, None)
+        metrics.add_time("read", timer() - start)
+        if hits is None:
+            return
+        metrics.add("triples", len(hits))
+        progress.add(0, len(hits))
+        window = []
+        for hit in hits:
+            doc = hit["_source"]
+            for field in ext_fields:
+                doc.pop(field, None)
+            window.append((hit["_id"], doc, doc_resources(doc)))
+        yield window
+
+
+# sourceFile of the new & changed files (delta run)
+def delta_sources():
+    return [manifest.source(path, config.rdf_dir) for path in config.delta_files]
+
+
+# windows of the triple-docs of a slice (index, slice_id, slices) of the baseline index (index.ext.source=baseline)
+# - the baseline docs are the triple-docs of the extended index (same fields & ids), read with a sliced scroll
+def scroll_windows(unit):
+    index_name, slice_id, slices = unit
+
+    # only the docs of new & changed files (delta run)
+    query = {"match_all": {}}
+    if config.delta_files is not None:
+        query = {"terms": {"sourceFile": delta_sources()}}
+
+    return hit_windows(el_controller.scroll_slice(index_name, query, slice_id, slices, config.bulk_size))
+
+
+# max resources of a re-enrichment unit - terms of its query (below index.max_terms_count)
+REFRESH_TERMS = 10000
+
+# fields of the resources of a triple-doc - matched exactly by their 'raw' keyword field (see mappings.get_extended)
+KEYWORD_FIELDS = ("subjectKeywords", "predicateKeywords", "objectKeywords")
+
+
+# units of the extended docs to be enriched again by a delta run - the docs of unchanged files referring to
+# resources whose properties changed (config.delta_resources), (index, batch_id, batches, resources) with
+# REFRESH_TERMS resources each
+def refresh_units():
+    resources = config.delta_resources
+    batches = (len(resources) + REFRESH_TERMS - 1) // REFRESH_TERMS
+    return [(config.ext_index, batch_id, batches,
+             tuple(resources[batch_id * REFRESH_TERMS:(batch_id + 1) * REFRESH_TERMS])) for batch_id in range(batches)]
+
+
+def is_refresh(unit):
+    return len(unit) == 4
+
+
+# windows of the extended docs of a re-enrichment unit, read with a scroll - docs of new & changed files
+# are indexed again anyway
+def refresh_windows(unit):
+    index_name, batch_id, batches, resources = unit
+    resources = list(resources)
+    query = {"bool": {"filter": {"bool": {"should": [{"terms": {field + ".raw": resources}}
+                                                     for field in KEYWORD_FIELDS]}},
+                      "must_not": {"terms": {"sourceFile": delta_sources()}}}}
+    return hit_windows(el_controller.scroll_slice(index_name, query, 0, 1, config.bulk_size))
+
+
+# triple-doc windows of a unit - a chunk of an input file, a slice of the baseline index or the docs to be
+# enriched again (delta run)
+def unit_windows(unit):
+    if is_refresh(unit):
+        return refresh_windows(unit)
+    if config.ext_source == "baseline":
+        return scroll_windows(unit)
+    return triple_windows(unit)
+
+
+def describe(unit):
+    if is_refresh(unit):
+        index_name, batch_id, batches, resources = unit
+        return "\'" + index_name + "\' re-enrichment " + str(batch_id + 1) + " / " + str(batches)
+    if config.ext_source == "baseline":
+        index_name, slice_id, slices = unit
+        return "\'" + index_name + "\' slice " + str(slice_id + 1) + " / " + str(slices)
+    return chunks.describe(unit)
+
+
+# input bytes of a unit - none for the slices of the baseline index
+def unit_bytes(unit):
+    if is_refresh(unit) or config.ext_source == "baseline":
+        return 0
+    path, start, end = unit
+    return end - start
+
+
+# checkpoint key of a unit - the slices of the baseline index are not files
+def unit_key(unit):
+    if is_refresh(unit):
+        index_name, batch_id, batches, resources = unit
+        return "refresh:" + index_name + ":" + str(zlib.crc32("\n".join(resources).encode("utf-8")))
+    if config.ext_source == "baseline":
+        index_name, slice_id, slices = unit
+        return "slice:" + index_name + ":" + str(slice_id) + "/" + str(slices)
+    return checkpoint.unit_key(unit)
+
 
-            # retrieve all subject's properties (described in ext_fields)
-            if config.ext_inc_sub:
-
-                for prop_name in config.ext_fields.keys():
-                    if prop_maps.__contains__(sub_keywords + "_" + prop_name):
-                        doc[prop_name + "_sub"] = prop_maps[sub_keywords + "_" + prop_name]
-                    else:
-                        prop_res = el_controller.search(prop_name, 150, get_property(sub_keywords))
-
-                        if len(prop_res['hits']['hits']) != 0:
-                            doc[prop_name + "_sub"] = []
-                            for prop_hit in prop_res['hits']['hits']:
-                                doc[prop_name + "_sub"].append(" " + prop_hit["_source"][prop_name])
-
-                            prop_maps[sub_keywords + "_" + prop_name] = doc[prop_name + "_sub"]
-
-            # retrieve all predicate's properties (described in ext_fields)
-            if config.ext_inc_pre and is_resource(pre_nspace):
-
-                for prop_name in config.ext_fields.keys():
-                    if prop_maps.__contains__(pre_keywords + "_" + prop_name):
-                        doc[prop_name + "_pre"] = prop_maps[pre_keywords + "_" + prop_name]
-                    else:
-                        prop_res = el_controller.search(prop_name, 150, get_property(pre_keywords))
-
-                        if len(prop_res['hits']['hits']) != 0:
-                            doc[prop_name + "_pre"] = []
-                            for prop_hit in prop_res['hits']['hits']:
-                                doc[prop_name + "_pre"].append(" " + prop_hit["_source"][prop_name])
-
-                            prop_maps[pre_keywords + "_" + prop_name] = doc[prop_name + "_pre"]
-
-            # retrieve all object's properties (described in ext_fields)
-            if config.ext_inc_obj and is_resource(obj_nspace):
-
-                for prop_name in config.ext_fields.keys():
-                    if prop_maps.__contains__(obj_keywords + "_" + prop_name):
-                        doc[prop_name + "_obj"] = prop_maps[obj_keywords + "_" + prop_name]
-                    else:
-                        prop_res = el_controller.search(prop_name, 150, get_property(obj_keywords))
-
-                        if len(prop_res['hits']['hits']) != 0:
-                            doc[prop_name + "_obj"] = []
-                            for prop_hit in prop_res['hits']['hits']:
-                                doc[prop_name + "_obj"].append(" " + prop_hit["_source"][prop_name])
-
-                            prop_maps[obj_keywords + "_" + prop_name] = doc[prop_name + "_obj"]
-
-            try:
-                # add insert action
-                action = {
-                    "_index": config.ext_index,
-                    '_op_type': 'index',
-                    "_type": "_doc",
-                    "_source": doc
-                }
-
-                bulk_actions.append(action)
-                if len(bulk_actions) > bulk_size:
-                    el_controller.bulk_action(bulk_actions)
-                    del bulk_actions[0:len(bulk_actions)]
+# generates the index actions of a unit (a chunk of an input file or a slice of the baseline index),
+# triple-docs are enriched in windows of elastic.bulk.size docs
+def extended_actions(unit):
+    for window in unit_windows(unit):
+        for action in enrich_window(window):
+            yield action
 
-            except elasticsearch.ElasticsearchException as es:
-                print("Elas4RDF: Exception occured (skipping line), in file: " + input_file)
-                if (config.verbose):
-                    print(str(es))
 
-            finally:
-                line = fp.readline()
-            ####
+#### async engine (index.engine=async) ####
+# a chunk is processed by 3 stages connected with bounded queues (backpressure): parsing of triple-doc windows (by
+# a thread, overlapping with the requests in flight), enrichment (index.engine.lookups windows & multi-searches in
+# flight) & sending (index.engine.bulks bulks in flight)
 
-    # flush any action that is left inside the bulk actions
-    el_controller.bulk_action(bulk_actions)
+async def resolve_properties_async(keywords, lookups):
+    start = timer()
+    resolved = {}
+    searches = resolve_local(keywords, resolved)
+
+    async def search(prop_name, batch, body):
+        attempt = 0
+        while True:
+            async with lookups:
+                prop_res = await el_controller.async_msearch(prop_name, body)
+            batch = resolve_responses(prop_name, batch, prop_res['responses'], resolved)
+            body = retry_searches(batch, attempt)
+            if body is None:
+                return
+            attempt += 1
+            await asyncio.sleep(el_controller.backoff(attempt))
+
+    await asyncio.gather(*[search(prop_name, batch, body) for prop_name, batch, body in property_searches(searches)])
+    metrics.add_time("lookup", timer() - start)
+    return resolved
+
+
+# a failed stage keeps draining its queue (so that no stage blocks), the error is raised at the end
+async def enrich_stage(windows, bulks, lookups, errors):
+    while True:
+        window = await windows.get()
+        if window is None:
+            return
+        if len(errors) != 0:
+            continue
+        try:
+            resolved = await resolve_properties_async(window_keywords(window), lookups)
+            await bulks.put(window_actions(window, resolved))
+        except Exception as e:
+            errors.append(e)
+
+
+async def send_stage(bulks, counts, errors):
+    while True:
+        actions = await bulks.get()
+        if actions is None:
+            return
+        if len(errors) != 0:
+            continue
+        try:
+            success, failed = await el_controller.async_bulk(actions, config.bulk_size, config.bulk_bytes)
+            counts[0] += success
+            counts[1] += failed
+        except Exception as e:
+            errors.append(e)
+
+
+# index a chunk with the async engine - returns (success, failed) docs
+async def async_index(unit):
+    el_controller.init_async()
+    windows = asyncio.Queue(config.engine_lookups)
+    bulks = asyncio.Queue(config.engine_bulks)
+    lookups = asyncio.Semaphore(config.engine_lookups)
+    counts = [0, 0]
+    errors = []
+    parser = ThreadPoolExecutor(1)
+    unit_iter = unit_windows(unit)
+
+    try:
+        enrichers = [asyncio.ensure_future(enrich_stage(windows, bulks, lookups, errors))
+                     for _ in range(config.engine_lookups)]
+        senders = [asyncio.ensure_future(send_stage(bulks, counts, errors)) for _ in range(config.engine_bulks)]
+
+        # the windows are parsed (or scrolled) by a thread, the event loop keeps serving the requests in flight
+        loop = asyncio.get_event_loop()
+        while len(errors) == 0:
+            window = await loop.run_in_executor(parser, next, unit_iter, None)
+            if window is None:
+                break
+            await windows.put(window)
+
+        for _ in enrichers:
+            await windows.put(None)
+        await asyncio.gather(*enrichers)
+        for _ in senders:
+            await bulks.put(None)
+        await asyncio.gather(*senders)
+    finally:
+        unit_iter.close()
+        parser.shutdown()
+        await el_controller.close_async()
+
+    if len(errors) != 0:
+        raise errors[0]
+    return counts[0], counts[1]
+
+
+# main method for extended indexing - accepts a chunk (path, start, end) of an input file (or a slice of the baseline index),
+# returns the chunk, whether it was fully indexed, the cache counters (none without a cache), the stage metrics
+# & the elapsed time
+def extended_index(unit):
+    start = timer()
+    input_file = unit[0]
+    completed = True
 
-    global finished_files
-    global total_files
-    finished_files.append(input_file)
+    # open the local property store (or its shared table) once per index instance
+    global store
+    if config.prop_store and store is None:
+        if config.prop_table:
+            store = prop_table.PropertyTable(config.prop_table)
+        else:
+            store = prop_store.PropertyStore(config.prop_store, readonly=True)
 
-    # print progress information
-    if len(finished_files) == len(total_files):
-        p_str = ""
-        end = "\n"
-        time.sleep(5)
-    else:
-        p_str = "\r"
-        end = ""
-    print("\t Files : " + str(len(finished_files)) + " / " +
-          str(len(total_files)) + " , triples indexed: " + str(
-        el_controller.count_docs(config.ext_index)) + p_str,
-          end=end)
+    if (config.verbose):
+        print("\t " + describe(unit) + ": started")
+
+    # stream the actions to ES in bulks (as indicated in elastic.bulk.* in -config), or to the shards
+    # of an offline export (index.export, properties from the local property store)
+    try:
+        if config.export:
+            success, failed = export.export_docs(
+                extended_actions(unit), export.shard_prefix(config.export, "extended", unit, config.rdf_dir),
+                config.export_shard_bytes, config.export_compress)
+        elif config.engine == "async":
+            success, failed = asyncio.run(async_index(unit))
+        else:
+            success, failed = el_controller.bulk_docs(extended_actions(unit), config.bulk_size,
+                                                      config.bulk_bytes, config.bulk_threads)
+        # failed docs are recorded in the dead-letter file, the chunk is not indexed again
+        if failed != 0:
+            print("Elas4RDF: " + str(failed) + " docs could not be indexed (see " + config.dead_letter +
+                  "), in file: " + input_file)
+
+    except elasticsearch.ElasticsearchException as es:
+        completed = False
+        print("Elas4RDF: Exception occured (skipping rest of chunk), in file: " + describe(unit))
+        if (config.verbose):
+            print(str(es))
+
+    progress.flush()
 
     if (config.verbose):
-        print("\t " + input_file + ": finished")
+        print("\t " + describe(unit) + ": finished")
+
+    cache_stats = cache.take_stats() if cache is not None else {}
+    return unit, completed, cache_stats, metrics.take(), timer() - start
 
 
 ####################################################
 
 
-# known namespaces - resources (manually maintained) TODO
-name_spaces = set()
-name_spaces.add("http://dbpedia.org/resource")
+# known namespaces - resources (index.ext.namespaces & the discovered ones)
+name_spaces = namespaces.NamespaceTrie(namespaces.DEFAULT)
 
+# local property store or its table (opened by each index instance)
+store = None
 
-def controller(config_f):
-    global config
-    config = config_f
+# max searches per multi-search request
+msearch_size = 1000
+
+# resolved properties cache (one per index instance)
+cache = None
+NOT_CACHED = object()
+
+
+# initialize an index instance - creates its ES client (none for an offline export) & its properties
+# cache, warmed up from the previous run (if filled from the same property source, token) & saved again
+# when the instance exits
+def init_instance(slots, token):
+    if not config.export:
+        el_controller.init_worker()
+
+    # no cache in front of the (memory-mapped, shared) property table
+    if uses_table():
+        return
+
+    global cache
+    cache = prop_cache.PropertyCache(config.cache_entries, config.cache_bytes)
+
+    if config.cache_dir:
+        with slots.get_lock():
+            slot = slots.value
+            slots.value += 1
+        cache_file = os.path.join(config.cache_dir, "cache-" + str(slot) + ".pickle")
+        # the properties of changed files may have changed - a delta run starts cold
+        if not config.delta:
+            cache.load(cache_file, token)
+        util.Finalize(cache, cache.save, args=(cache_file, token), exitpriority=10)
+
+
+# state of the property source the cache is filled from (index.ext.cache.dir) - the size & modification
+# time of the local property store, or the creation date & docs of the properties-indexes
+def source_token():
+    if config.prop_store:
+        stat = os.stat(config.prop_store)
+        return "store", os.path.abspath(config.prop_store), stat.st_size, stat.st_mtime_ns
+    return ("indexes",) + tuple((prop_name, el_controller.creation_date(prop_name),
+                                 el_controller.count_docs(prop_name)) for prop_name in sorted(config.ext_fields.keys()))
 
-    rdf_dir = config.rdf_dir
 
-    # count.nt files
-    global total_files
-    total_files = []
-    for path in Path(rdf_dir).rglob('*.nt'):
-        total_files.append(str(path.absolute()))
+# properties read from the property table (index.prop.table), shared by all index instances
+def uses_table():
+    return bool(config.prop_store and config.prop_table)
 
-    if len(total_files) == 0:
-        print('Elas4RDF error: No RDF files (.nt) found in the specified folder')
+
+def input_files():
+    # list all .nt files (plain or compressed) of input RDF_DIR
+    all_files = chunks.list_files(config.rdf_dir)
+
+    if len(all_files) == 0:
+        print('Elas4RDF error: No RDF files (.nt, .nt.gz, .nt.bz2, .nt.zst) found in the specified folder')
         exit(-1)
 
-    print_message.extended_starting(config, str(len(total_files)))
+    # only new & changed files (delta run)
+    if config.delta_files is not None:
+        all_files = [path for path in all_files if path in config.delta_files]
+    return all_files
+
+
+# slices of the baseline index (index.ext.slices, defaults to its number of shards), read in parallel
+# by the index instances - (index, slice_id, slices) units
+def baseline_slices():
+    # the last baseline docs become visible to the scroll
+    el_controller.refresh(config.base_index)
+    slices = config.ext_slices
+    if slices <= 0:
+        slices = el_controller.shard_count(config.base_index)
+    return [(config.base_index, slice_id, slices) for slice_id in range(slices)]
+
+
+def controller(config_f):
+    global config
+    config = config_f
 
-    # list all .nt files of input RDF_DIR
-    all_files = glob.glob(rdf_dir + '/**/*.nt', recursive=True)
+    # known namespaces, shared by the (forked) index instances
+    global name_spaces
+    name_spaces = namespaces.NamespaceTrie(config.ext_namespaces)
+    if config.ext_discover:
+        discovered_counts = namespaces.load(config.ext_discover)
+        for namespace in discovered_counts.keys():
+            name_spaces.add(namespace)
+        print("\t namespaces - configured: " + str(len(config.ext_namespaces)) + ", discovered: " +
+              str(len(discovered_counts)))
+
+    if config.ext_source == "baseline":
+        total_units = baseline_slices()
+        print_message.extended_starting(config, "baseline index \'" + config.base_index + "\', slices : " +
+                                        str(len(total_units)))
+    else:
+        all_files = input_files()
+        # split files into chunks (as indicated in index.chunk_size in -config)
+        total_units = chunks.plan(all_files, config.chunk_size)
+        print_message.extended_starting(config, "Files : " + str(len(all_files)) + ", chunks : " +
+                                        str(len(total_units)))
+
+    # the extended docs of unchanged files referring to resources whose properties changed (delta run)
+    refresh = refresh_units()
+    if len(refresh) != 0:
+        print("\t re-enrichment - extended docs referring to " + str(len(config.delta_resources)) +
+              " resources with changed properties")
+        total_units = total_units + refresh
+
+    # skip chunks indexed by an interrupted run (if resumed)
+    state = checkpoint.Checkpoint(config.state_file, "extended")
+    pending_units = [unit for unit in total_units if not state.has(unit_key(unit))]
+    if len(pending_units) != len(total_units):
+        print("\t resuming, chunks already indexed: " + str(len(total_units) - len(pending_units)))
+        total_units = pending_units
+
+    # dispatch the longest units first (as recorded in index.schedule by the previous runs) - slices have no bytes
+    scheduled = schedule.Schedule(config.schedule_file, "extended")
+    pending_units = scheduled.order(pending_units, describe, unit_bytes)
 
     start = timer()
 
-    # deploy index instances (as indicated in index.instances in -config)
-    manager = Manager()
-    global finished_files
-    finished_files = manager.list()
-    p = Pool(config.instances)
-    p.map(extended_index, all_files)
+    # property table of the local property store, memory-mapped by all index instances
+    if uses_table() and prop_table.is_stale(config.prop_table, config.prop_store):
+        keys = prop_table.build(config.prop_store, config.prop_table)
+        print("\t property table - \'" + config.prop_table + "\' (" + str(keys) + " resources' properties)")
+
+    token = None
+    if config.cache_dir and not uses_table():
+        os.makedirs(config.cache_dir, exist_ok=True)
+        token = source_token()
+
+    # sum up cache counters of all index instances
+    cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # deploy index instances (as indicated in index.instances or index.pipeline in -config), their
+    # progress is shown while waiting - the input bytes of the chunks (none for slices)
+    progress.init()
+    shown = progress.Progress(len(pending_units), sum(unit_bytes(unit) for unit in pending_units))
+    p = pipeline.instances(config, init_instance, (Value('i', 0), token))
+    all_completed = True
+    results = p.imap_unordered(extended_index, pending_units, chunksize=1)
+    for unit, completed, stats, stage_stats, elapsed in progress.results(results, shown):
+        metrics.merge("extended", stage_stats)
+        if completed:
+            state.add(unit_key(unit))
+            scheduled.record(describe(unit), elapsed)
+        else:
+            all_completed = False
+        for key, value in stats.items():
+            cache_stats[key] += value
+    p.close()
+    p.join()
 
     end = timer()
 
-    docs_e = el_controller.count_docs(config.ext_index)
-    print_message.extended_finished(config, str((end - start)), docs_e)
+    if config.export:
+        triples = metrics.totals.get("extended", {"counters": {}})["counters"].get("triples", 0)
+        print_message.export_finished(config, "extended", str((end - start)), triples)
+    else:
+        docs_e = el_controller.count_docs(config.ext_index)
+        print_message.extended_finished(config, str((end - start)), docs_e)
+    if not uses_table():
+        print_message.cache_report(cache_stats)
+
+    return all_completed
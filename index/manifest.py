@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+
+from index import chunks
+
+# dataset manifest - the input files of the last run (size, modification time, content hash & the
+# chunks they were indexed in), used to index only the changes (delta) of a dataset
+#
+# docs are tagged with the file they come from (sourceFile, the path relative to index.data), so
+# the docs of a changed or removed file can be deleted - the sourceFile is also part of the doc ids,
+# a triple found in several files has a doc per file
+
+
+# sourceFile of an input file
+def source(path, rdf_dir):
+    return os.path.relpath(path, rdf_dir)
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as fp:
+        return json.load(fp)["files"]
+
+
+def save(path, entries):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump({"files": entries}, fp, indent=1)
+    os.replace(tmp_path, path)
+
+
+# compare the input files with the manifest entries - returns (entries, new, changed, removed)
+# new & changed are input files, removed are the sourceFile of files no longer in the dataset
+# - the chunks of each file are those of this run's plan (subject_runs with index.entity, see chunks.plan)
+def compare(old_entries, files, rdf_dir, chunk_size, subject_runs=False):
+    entries = {}
+    new = []
+    changed = []
+    for path in files:
+        name = source(path, rdf_dir)
+        stat = os.stat(path)
+        old = old_entries.get(name)
+
+        file_chunks = [[start, end] for _, start, end in chunks.plan([path], chunk_size, subject_runs)]
+
+        # unchanged size & modification time - not hashed again
+        if old is not None and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+            entries[name] = dict(old, chunks=file_chunks)
+            continue
+
+        entries[name] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": file_hash(path),
+                         "chunks": file_chunks}
+        if old is None:
+            new.append(path)
+        elif old["hash"] != entries[name]["hash"]:
+            changed.append(path)
+
+    removed = [name for name in old_entries.keys() if name not in entries]
+    return entries, new, changed, removed
@@ -35,6 +35,10 @@ def get_baseline(config):
         base_map['mappings']['_doc']['properties']['predicateNspaceKeys']['enabled'] = False
         base_map['mappings']['_doc']['properties']['objectNspaceKeys']['enabled'] = False
 
+    # file of each doc (see index.manifest)
+    if config.manifest:
+        base_map['mappings']['_doc']['properties']['sourceFile'] = {"type": "keyword"}
+
     ## curl-command, used for debuggin
     # curl_put += "\n" + json.dumps(base_map, indent=4, sort_keys=False) + '\''
 
@@ -96,13 +100,62 @@ def get_extended(config):
             ext_map['mappings']['_doc']['properties'][f]['type'] = "text"
             ext_map['mappings']['_doc']['properties'][f]['analyzer'] = "m_analyzer"
 
+    # file of each doc (see index.manifest) - & the exact keywords of its resources ('raw'), a delta run enriches
+    # again the docs referring to resources whose properties changed
+    if config.manifest:
+        ext_map['mappings']['_doc']['properties']['sourceFile'] = {"type": "keyword"}
+        for field in ("subjectKeywords", "predicateKeywords", "objectKeywords"):
+            if not config.inc_uris:
+                ext_map['mappings']['_doc']['properties'][field] = {"type": "keyword", "index": False,
+                                                                    "doc_values": False}
+            ext_map['mappings']['_doc']['properties'][field]['fields'] = {"raw": {"type": "keyword",
+                                                                                  "ignore_above": 512}}
+
     ## curl-command, used for debuggin
     # curl_put += json.dumps(ext_map, indent=4, sort_keys=False) + '\''
 
     return ext_map
 
 
-def get_properties(field):
+def get_entity(config):
+    # load entity mapping from res
+    with open('res/mapping/entity.json') as file:
+        entity_map = json.load(file)
+
+    if config.inc_uris:
+        entity_map['mappings']['_doc']['properties']['subjectKeywords']['type'] = "text"
+        entity_map['mappings']['_doc']['properties']['predicateKeywords']['type'] = "text"
+        entity_map['mappings']['_doc']['properties']['objectKeywords']['type'] = "text"
+
+        entity_map['mappings']['_doc']['properties']['subjectKeywords']['analyzer'] = "m_analyzer"
+        entity_map['mappings']['_doc']['properties']['predicateKeywords']['analyzer'] = "m_analyzer"
+        entity_map['mappings']['_doc']['properties']['objectKeywords']['analyzer'] = "m_analyzer"
+    else:
+        entity_map['mappings']['_doc']['properties']['subjectKeywords']['enabled'] = False
+        entity_map['mappings']['_doc']['properties']['predicateKeywords']['enabled'] = False
+        entity_map['mappings']['_doc']['properties']['objectKeywords']['enabled'] = False
+
+    if config.inc_nspace:
+        entity_map['mappings']['_doc']['properties']['subjectNspaceKeys']['type'] = "text"
+        entity_map['mappings']['_doc']['properties']['predicateNspaceKeys']['type'] = "text"
+        entity_map['mappings']['_doc']['properties']['objectNspaceKeys']['type'] = "text"
+
+        entity_map['mappings']['_doc']['properties']['subjectNspaceKeys']['analyzer'] = "url_analyzer"
+        entity_map['mappings']['_doc']['properties']['predicateNspaceKeys']['analyzer'] = "url_analyzer"
+        entity_map['mappings']['_doc']['properties']['objectNspaceKeys']['analyzer'] = "url_analyzer"
+    else:
+        entity_map['mappings']['_doc']['properties']['subjectNspaceKeys']['enabled'] = False
+        entity_map['mappings']['_doc']['properties']['predicateNspaceKeys']['enabled'] = False
+        entity_map['mappings']['_doc']['properties']['objectNspaceKeys']['enabled'] = False
+
+    # file of each doc (see index.manifest)
+    if config.manifest:
+        entity_map['mappings']['_doc']['properties']['sourceFile'] = {"type": "keyword"}
+
+    return entity_map
+
+
+def get_properties(config, field):
     # load extended mapping from res
     with open('res/mapping/properties.json') as file:
         ext_map = json.load(file)
@@ -111,4 +164,8 @@ def get_properties(field):
     ext_map['mappings']['_doc']['properties'][field]['type'] = "text"
     ext_map['mappings']['_doc']['properties'][field]['analyzer'] = "m_analyzer"
 
+    # file of each doc (see index.manifest)
+    if config.manifest:
+        ext_map['mappings']['_doc']['properties']['sourceFile'] = {"type": "keyword"}
+
     return ext_map
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+from itertools import islice
+from timeit import default_timer as timer
+
+# counters & timers of the indexing stages - kept per index instance, taken (& reset) after each chunk
+# and summed up by the controller (per process: baseline, extended)
+#
+# seconds spent in each stage (summed over index instances & bulk threads):
+#   read, parse (with the serialization of the baseline docs), lookup, serialize, send, write (offline export)
+# counters:
+#   lines, triples, lookups (resources searched), searches (multi-search requests), search_retries (rejected searches),
+#   bulk_requests, bulk_docs, bulk_bytes, rejected (429 items), retries, failed (docs),
+#   exported (docs), export_bytes, subject_runs (consecutive triple-docs of the same subject)
+
+# lines read (& timed) at once
+READ_BATCH = 1000
+
+# bulk threads update the counters concurrently
+lock = threading.Lock()
+counters = {}
+seconds = {}
+
+# totals of the controller, per process
+totals = {}
+
+
+def add(name, value=1):
+    with lock:
+        counters[name] = counters.get(name, 0) + value
+
+
+def add_time(stage, elapsed):
+    with lock:
+        seconds[stage] = seconds.get(stage, 0.0) + elapsed
+
+
+# counters & timers of the index instance since the last call
+def take():
+    with lock:
+        stats = {"counters": dict(counters), "seconds": dict(seconds)}
+        counters.clear()
+        seconds.clear()
+    return stats
+
+
+def merge(process, stats):
+    total = totals.setdefault(process, {"counters": {}, "seconds": {}})
+    for kind in ("counters", "seconds"):
+        for name, value in stats[kind].items():
+            total[kind][name] = total[kind].get(name, 0) + value
+
+
+# lines in batches of READ_BATCH, the reading is timed (stage 'read')
+def read_batches(lines):
+    lines = iter(lines)
+    while True:
+        start = timer()
+        batch = list(islice(lines, READ_BATCH))
+        add_time("read", timer() - start)
+        if len(batch) == 0:
+            return
+        add("lines", len(batch))
+        yield batch
+
+
+# writes the totals as JSON & Prometheus text (metrics.json, metrics.prom) - returns their paths
+def write_report(directory):
+    json_path = os.path.join(directory, "metrics.json")
+    with open(json_path, "w") as fp:
+        json.dump(totals, fp, indent=4, sort_keys=True)
+
+    lines = ["# HELP elas4rdf_stage_seconds_total Seconds spent in each indexing stage, summed over index instances.",
+             "# TYPE elas4rdf_stage_seconds_total counter"]
+    for process, total in sorted(totals.items()):
+        for stage, value in sorted(total["seconds"].items()):
+            lines.append("elas4rdf_stage_seconds_total{process=\"" + process + "\",stage=\"" + stage + "\"} " +
+                         repr(value))
+
+    names = sorted(set(name for total in totals.values() for name in total["counters"].keys()))
+    for name in names:
+        lines.append("# TYPE elas4rdf_" + name + "_total counter")
+        for process, total in sorted(totals.items()):
+            if name in total["counters"]:
+                lines.append("elas4rdf_" + name + "_total{process=\"" + process + "\"} " +
+                             str(total["counters"][name]))
+
+    prom_path = os.path.join(directory, "metrics.prom")
+    with open(prom_path, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+    return json_path, prom_path
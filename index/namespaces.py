@@ -0,0 +1,75 @@
+import json
+import os
+
+# resource namespaces - the predicates & objects of the extended index whose namespace starts with one of
+# them are resources, extended with their properties (index.ext.namespaces)
+#
+# namespaces are kept in a prefix trie, a namespace is matched in O(length) whatever the number of known
+# namespaces - the (few, repeated) namespaces of the triples are memoized, up to MEMO_SIZE entries
+#
+# namespaces can also be discovered by the baseline pass (index.ext.namespaces.discover): the namespaces
+# of the subjects that carry index.ext.fields properties, saved with their counts in a JSON file
+
+DEFAULT = ["http://dbpedia.org/resource"]
+
+MEMO_SIZE = 1 << 16
+
+# marks the end of a namespace in a trie node
+END = ""
+
+
+class NamespaceTrie(object):
+    def __init__(self, namespaces=()):
+        self.root = {}
+        self.memo = {}
+        for namespace in namespaces:
+            self.add(namespace)
+
+    def add(self, namespace):
+        if not namespace:
+            return
+        node = self.root
+        for char in namespace:
+            node = node.setdefault(char, {})
+        node[END] = namespace
+        self.memo.clear()
+
+    # the longest known namespace that is a prefix of uri (or None)
+    def longest_prefix(self, uri):
+        node = self.root
+        match = None
+        for char in uri:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(END, match)
+        return match
+
+    def matches(self, uri):
+        result = self.memo.get(uri)
+        if result is None:
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo.clear()
+            result = self.memo[uri] = self.longest_prefix(uri) is not None
+        return result
+
+
+# discovered namespaces (namespace -> count of subjects with properties)
+def load(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as fp:
+        return json.load(fp)["namespaces"]
+
+
+def save(path, counts):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump({"namespaces": counts}, fp, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def merge(counts, other):
+    for namespace, count in other.items():
+        counts[namespace] = counts.get(namespace, 0) + count
+    return counts
@@ -0,0 +1,142 @@
+import hashlib
+import re
+
+# single-pass N-Triples line parser, shared by the baseline & extended indexing
+#
+# parse_line returns a tuple - or None for lines that are not triples (comments, empty lines, ..):
+#   (subject, predicate, obj, sub_keywords, sub_nspace, pre_keywords, pre_nspace, obj_keywords, obj_nspace)
+# subject, predicate & obj are the full terms (normalized), the rest are the keywords & namespaces of the triple-docs -
+# the object term keeps its kind: <IRI>, _:blank node or "literal" (unescaped) with its language or datatype tag, so
+# that "Athens"@en, "Athens"@fr, "Athens" & <Athens> are distinct triples (doc ids)
+
+# subject: IRI | blank node, predicate: IRI,
+# object: IRI | blank node | literal (escaped '\"', may contain '<', ' ', ..) & an optional language or datatype tag,
+# the triple may end with a comment - the literal is the N-Triples string production, unrolled (faster than an
+# alternation per character)
+TRIPLE = re.compile(r'[ \t]*(?:<([^>]*)>|_:(\S+))'
+                    r'[ \t]+<([^>]*)>'
+                    r'[ \t]+(?:<([^>]*)>|_:(\S+)|"([^"\\\r\n]*(?:\\.[^"\\\r\n]*)*)"(@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+                    r'[ \t]*\.[ \t]*(?:#[^\n]*)?\r?\n?$')
+
+# IRIs repeat a lot (subjects of consecutive lines, predicates, types, ..) - their terms
+# are memoized, up to MEMO_SIZE entries
+MEMO_SIZE = 1 << 16
+resources_memo = {}
+predicates_memo = {}
+
+ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+
+ESCAPE_CHARS = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", "\"": "\"", "'": "'", "\\": "\\"}
+
+SURROGATE = re.compile("[\ud800-\udfff]")
+
+# escapes of invalid code points (lone surrogates, out of range) become U+FFFD
+REPLACEMENT = "\ufffd"
+
+
+def unescape_char(match):
+    if match.group(3) is not None:
+        return ESCAPE_CHARS.get(match.group(3), match.group(3))
+    code = int(match.group(1) or match.group(2), 16)
+    if code > 0x10FFFF:
+        return REPLACEMENT
+    return chr(code)
+
+
+# resolve the escape sequences of a literal - escaped UTF-16 surrogate pairs (\uD83D\uDE00) are combined into
+# their character, so that the text can be encoded (UTF-8) by the doc ids, the bulk docs & the property store
+def unescape(literal):
+    if "\\" not in literal:
+        return literal
+    text = ESCAPE.sub(unescape_char, literal)
+    if SURROGATE.search(text) is not None:
+        text = text.encode("utf-16-le", "surrogatepass").decode("utf-16-le", "replace")
+    return text
+
+
+# keywords & namespace of a subject or object IRI
+def resource_terms(uri):
+    head, sep, tail = uri.rpartition(':')
+
+    # a prefix is included in the uri (e.g. .../resource/Category:Name)
+    if ':' in head:
+        slash = head.rfind('/')
+        return head[slash + 1:] + ":" + tail, head[:slash + 1]
+
+    n_space, sep, local = uri.rpartition('/')
+    if not sep:
+        n_space = uri
+    return local.replace(":", ""), n_space
+
+
+# keywords & namespace of a predicate IRI
+def predicate_terms(uri):
+    if "#" in uri:
+        n_space, sep, local = uri.rpartition('#')
+    else:
+        n_space, sep, local = uri.rpartition('/')
+        if not sep:
+            n_space = uri
+    return local.replace(":", ""), n_space
+
+
+def memoize(memo, uri, terms):
+    if len(memo) >= MEMO_SIZE:
+        memo.clear()
+    memo[uri] = terms
+    return terms
+
+
+def parse_line(line):
+    match = TRIPLE.match(line)
+    if match is None:
+        return None
+    subject, sub_bnode, predicate, obj, obj_bnode, literal, tag = match.groups()
+
+    # handle subject
+    if subject is not None:
+        terms = resources_memo.get(subject)
+        if terms is None:
+            terms = memoize(resources_memo, subject, resource_terms(subject))
+        sub_keywords, sub_nspace = terms
+    else:
+        subject = "_:" + sub_bnode
+        sub_keywords, sub_nspace = sub_bnode, ""
+
+    # handle predicate
+    terms = predicates_memo.get(predicate)
+    if terms is None:
+        terms = memoize(predicates_memo, predicate, predicate_terms(predicate))
+    pre_keywords, pre_nspace = terms
+
+    # handle object
+    if literal is not None:
+        obj_keywords, obj_nspace = unescape(literal), ""
+        obj = '"' + obj_keywords + '"' + (tag or "")
+    elif obj is not None:
+        terms = resources_memo.get(obj)
+        if terms is None:
+            if "/" not in obj and "#" in obj:
+                terms = memoize(resources_memo, obj, predicate_terms(obj))
+            else:
+                terms = memoize(resources_memo, obj, resource_terms(obj))
+        obj_keywords, obj_nspace = terms
+        obj = "<" + obj + ">"
+    else:
+        obj = "_:" + obj_bnode
+        obj_keywords, obj_nspace = obj_bnode, ""
+
+    return subject, predicate, obj, sub_keywords, sub_nspace, pre_keywords, pre_nspace, obj_keywords, obj_nspace
+
+
+# stable document id of a triple (or of any other terms) - re-indexing a triple overwrites its doc
+def doc_id(*terms):
+    return hashlib.blake2b("\x00".join(terms).encode("utf-8"), digest_size=12).hexdigest()
+
+
+# doc id of a triple of a file - blank node labels are scoped to their file (scope, its sourceFile), so the
+# triples with blank nodes hash it as well, unless the id terms already include it (index.manifest)
+def triple_id(id_terms, scope, subject, predicate, obj):
+    if not id_terms and (subject.startswith("_:") or obj.startswith("_:")):
+        return doc_id(scope, subject, predicate, obj)
+    return doc_id(*id_terms, subject, predicate, obj)
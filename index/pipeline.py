@@ -0,0 +1,66 @@
+import queue
+import threading
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from index import chunks, metrics
+
+# single-process pipelined mode (index.pipeline) - for small machines, instead of forked index instances
+# the units are indexed one at a time by a thread of the controller process, as a pipeline of threads
+# connected by bounded queues:
+#   reader   reads (& decompresses) the lines of the unit, READ_AHEAD batches ahead of the parser
+#   parser   parses the lines & builds the docs (the index instance's thread)
+#   senders  send the bulks to ES (elastic.bulk.threads)
+# file & network I/O (which release the GIL) overlap with the parsing
+
+# batches of lines read ahead by the reader
+READ_AHEAD = 8
+
+# marks the end of the reader's batches
+END = object()
+
+
+# the index instances of a process - forked instances (index.instances), or a thread (index.pipeline)
+def instances(config, initializer, initargs=()):
+    if config.pipeline:
+        return ThreadPool(1, initializer=initializer, initargs=initargs)
+    return Pool(config.instances, initializer=initializer, initargs=initargs)
+
+
+# batches of lines of a unit - read by the reader stage (index.pipeline)
+def unit_batches(unit, config):
+    batches = metrics.read_batches(chunks.read_lines(unit, config.decompress_thread))
+    if config.pipeline:
+        return read_ahead(batches)
+    return batches
+
+
+# reader stage - batches are read by a separate thread
+def read_ahead(batches):
+    buffer = queue.Queue(READ_AHEAD)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_batches, args=(batches, buffer, stop), daemon=True)
+    reader.start()
+
+    try:
+        while True:
+            batch = buffer.get()
+            if batch is END:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        # the parser may stop early - release the reader
+        stop.set()
+        reader.join()
+
+
+def read_batches(batches, buffer, stop):
+    try:
+        for batch in batches:
+            if not chunks.put_block(buffer, batch, stop):
+                return
+        chunks.put_block(buffer, END, stop)
+    except Exception as e:
+        chunks.put_block(buffer, e, stop)
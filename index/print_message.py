@@ -10,23 +10,62 @@ def verification_message(config):
                        "\n\t base.include_namespace: " + str(
             config.inc_nspace)
 
-    if config.prop and config.base:
+    if config.prop and config.base and config.prop_index:
         print("\n\t properties - " + str(config.ext_fields.keys()), end='')
 
+    if config.entity:
+        print("\n\t entity - \'" + config.entity_index + "\'", end='')
+
     if config.ext:
         print("\n\t extended - \'" + config.ext_index + "\'", end='')
         options_str += "\n\t ext.include_subject: " + str(config.ext_inc_sub) + \
                        "\n\t ext.include_predicate: " + str(config.ext_inc_pre) + \
                        "\n\t ext.include_object: " + str(config.ext_inc_obj)
 
-    if not config.base and not config.ext:
-        print("No indexes are enabled, see configuration (baseline & extended -> no). Exiting.")
+    if not config.base and not config.ext and not config.entity:
+        print("No indexes are enabled, see configuration (baseline, extended & entity -> no). Exiting.")
         return
 
+    if config.prop_store:
+        options_str += "\n\t index.prop.store: " + config.prop_store
+    if config.prop_store and config.prop_table:
+        options_str += "\n\t index.prop.table: " + config.prop_table
+
+    if config.bulk_load:
+        options_str += "\n\t index.bulk_load: " + str(config.bulk_load) + \
+                       "\n\t index.bulk_load.force_merge: " + str(config.force_merge)
+
+    if config.resume:
+        options_str += "\n\t resume from: " + config.state_file
+
+    if config.ext:
+        options_str += "\n\t index.ext.namespaces: " + " ".join(config.ext_namespaces)
+    if config.ext_discover:
+        options_str += "\n\t index.ext.namespaces.discover: " + config.ext_discover
+
+    if config.ext and config.ext_source == "baseline":
+        options_str += "\n\t index.ext.source: baseline (\'" + config.base_index + "\', slices: " + \
+                       (str(config.ext_slices) if config.ext_slices > 0 else "shards") + ")"
+
+    if config.ext and config.engine == "async":
+        options_str += "\n\t index.engine: async (lookups: " + str(config.engine_lookups) + \
+                       ", bulks: " + str(config.engine_bulks) + ")"
+
+    if config.manifest:
+        options_str += "\n\t index.manifest: " + config.manifest + \
+                       "\n\t delta: " + str(config.delta)
+
+    if config.export:
+        options_str += "\n\t index.export: " + config.export + " (no ES requests, compress: " + \
+                       config.export_compress + ", shard bytes: " + str(config.export_shard_bytes) + ")"
+
     options_str += "\n\t index.data: " + config.rdf_dir + \
-                   "\n\t index.instances: " + str(config.instances) + \
+                   "\n\t index.instances: " + (str(config.instances), "pipeline")[config.pipeline] + \
+                   "\n\t index.chunk_size: " + str(config.chunk_size) + \
                    "\n\t elastic.address: " + config.elastic_address + \
-                   "\n\t elastic.port: " + str(config.elastic_port)
+                   "\n\t elastic.port: " + str(config.elastic_port) + \
+                   "\n\t elastic.connections: " + str(config.elastic_connections) + \
+                   " (sniff: " + str(config.elastic_sniff) + ", compress: " + str(config.elastic_compress) + ")"
 
     print(options_str)
     input("Press Enter to continue...")
@@ -36,9 +75,66 @@ def finished(output_path):
     print()
     print("Elas4RDF: Finished process. Output configuration: " + output_path)
 
+def metrics_report(totals, report_paths):
+    print()
+    print("Elas4RDF: Stage times (sec, summed over index instances): ")
+    for process, total in sorted(totals.items()):
+        print("\t " + process + " - " + ", ".join(stage + ": " + "{:.2f}".format(elapsed)
+                                                 for stage, elapsed in sorted(total["seconds"].items())))
+    print("\t report: " + " , ".join(report_paths))
+
+
+def progress(done, units, triples, triples_rate, bytes_rate, eta, end):
+    eta_str = "--:--:--"
+    if eta is not None:
+        eta = int(eta)
+        eta_str = "{:02d}:{:02d}:{:02d}".format(eta // 3600, eta // 60 % 60, eta % 60)
+    rates = "{:.0f}".format(triples_rate) + "/sec"
+    # no input bytes for slices of the baseline index
+    if bytes_rate is not None:
+        rates += ", " + "{:.2f}".format(bytes_rate / (1024 * 1024)) + " MB/sec"
+    print("\r\t Chunks : " + str(done) + " / " + str(units) + " , triples parsed: " + str(triples) +
+          " (" + rates + ") , ETA " + eta_str + "   ", end=end, flush=True)
+
+
+def delta_starting(new, changed, removed, unchanged):
+    print("Elas4RDF: Delta indexing - files new: " + str(new) + ", changed: " + str(changed) +
+          ", removed: " + str(removed) + ", unchanged: " + str(unchanged))
+
+
+def bulk_load_report(phase_times):
+    print()
+    print("Elas4RDF: Bulk-load phases: ")
+    for phase, elapsed in phase_times:
+        print("\t " + phase + ": " + "{:.2f}".format(elapsed) + " sec")
+
+
+def export_finished(config, process, stats, triples):
+    print("Elas4RDF: Successfully exported " + process + " (" + str(triples) + " triples) to: " + config.export)
+
+    if process == "baseline" and config.prop and config.prop_store:
+        print("\t property store - \'" + config.prop_store + "\'")
+
+    if config.verbose:
+        print("\telapsed time " + stats)
+
+
+#### loader ####
+def load_starting(directory, shards, indexes):
+    print("Elas4RDF: Loading export \'" + directory + "\' .. Shards : " + str(shards) + ", indexes : " +
+          str(list(indexes)))
+
+
+def load_finished(stats, docs, failed):
+    print("Elas4RDF: Successfully loaded " + str(docs) + " docs (failed: " + str(failed) + ")")
+    print("\telapsed time " + stats)
+
+
 #### baseline ####
 def baseline_starting(config, stats):
-    if config.prop:
+    if not config.base:
+        print("Elas4RDF: Entity indexing started .. ", end='')
+    elif config.prop:
         print("Elas4RDF: Baseline & properties indexing started .. ", end='')
     else:
         print("Elas4RDF: Baseline indexing started .. ", end='')
@@ -46,7 +142,7 @@ def baseline_starting(config, stats):
 
 
 def baseline_finised(config, stats, docs_num):
-    if config.prop:
+    if config.prop and config.prop_index:
         print("Elas4RDF: Successfully created indexes: "
               "\n\t 1. baseline - \'" + config.base_index + "\'" + " (" + str(docs_num) + " triples)" +
               "\n\t 2. properties - " + str(config.ext_fields.keys()) +
@@ -56,6 +152,17 @@ def baseline_finised(config, stats, docs_num):
               "\n\t 1. baseline - \'" + config.base_index + "\' " + "(" + str(docs_num) + " triples)" +
               "")
 
+    if config.prop and config.prop_store:
+        print("\t property store - \'" + config.prop_store + "\'")
+
+    if config.verbose:
+        print("\telapsed time " + stats)
+
+
+def entity_finished(config, stats, docs_num):
+    print("Elas4RDF: Successfully created index: "
+          "\n\t entity - \'" + config.entity_index + "\' " + "(" + str(docs_num) + " entities)")
+
     if config.verbose:
         print("\telapsed time " + stats)
 
@@ -64,7 +171,7 @@ def baseline_finised(config, stats, docs_num):
 def extended_starting(config, stats):
     print()
     print("Elas4RDF: Extended '" + config.ext_index + "' indexing started .. ", end='')
-    print("Files : " + stats)
+    print(stats)
 
 
 def extended_finished(config, stats, docs_num):
@@ -77,3 +184,12 @@ def extended_finished(config, stats, docs_num):
 
     if config.verbose:
         print("\telapsed time " + stats)
+
+
+def cache_report(stats):
+    lookups = stats["hits"] + stats["misses"]
+    ratio = 0.0
+    if lookups != 0:
+        ratio = stats["hits"] / lookups
+    print("\t properties cache - hits: " + str(stats["hits"]) + ", misses: " + str(stats["misses"]) +
+          ", evictions: " + str(stats["evictions"]) + " (hit ratio " + "{:.2f}".format(ratio) + ")")
@@ -0,0 +1,102 @@
+import multiprocessing
+import threading
+from timeit import default_timer as timer
+
+from index import print_message
+
+# progress of an indexing process - the index instances add the input bytes they read & triples they parse to shared
+# counters (created by the controller, inherited by the forked instances) and the controller shows the
+# rates & ETA while it waits for their results
+#
+# bytes are the byte offsets reached in plain input files - compressed files (read whole) are counted
+# once read. Without input bytes (slices of the baseline index) the ETA is based on the units done
+
+# seconds between progress updates
+INTERVAL = 2
+
+# bytes read & triples parsed by an index instance before they are added to the shared counters
+FLUSH_BYTES = 1024 * 1024
+FLUSH_TRIPLES = 10000
+
+# shared [bytes, triples]
+counters = None
+
+# not yet added to the shared counters (per index instance) - updated by the reader & parser threads
+# of the pipelined mode (index.pipeline)
+pending = [0, 0]
+pending_lock = threading.Lock()
+
+
+def init():
+    global counters
+    counters = multiprocessing.Array('q', 2)
+
+
+def add(read_bytes, triples):
+    if counters is None:
+        return
+    with pending_lock:
+        pending[0] += read_bytes
+        pending[1] += triples
+        full = pending[0] >= FLUSH_BYTES or pending[1] >= FLUSH_TRIPLES
+    if full:
+        flush()
+
+
+# called by the index instances at the end of each unit
+def flush():
+    if counters is None:
+        return
+    with pending_lock:
+        read_bytes, triples = pending
+        pending[0] = 0
+        pending[1] = 0
+    if read_bytes == 0 and triples == 0:
+        return
+    with counters.get_lock():
+        counters[0] += read_bytes
+        counters[1] += triples
+
+
+class Progress(object):
+    def __init__(self, units, total_bytes):
+        self.units = units
+        self.done = 0
+        self.total_bytes = total_bytes
+        self.start = timer()
+
+    def show(self, end=""):
+        elapsed = max(timer() - self.start, 1e-6)
+        with counters.get_lock():
+            read_bytes, triples = counters[0], counters[1]
+        read_bytes = min(read_bytes, self.total_bytes)
+
+        if self.total_bytes != 0:
+            fraction = read_bytes / float(self.total_bytes)
+        else:
+            fraction = self.done / float(max(self.units, 1))
+
+        bytes_rate = None
+        if self.total_bytes != 0:
+            bytes_rate = read_bytes / elapsed
+        eta = None
+        if fraction > 0:
+            eta = elapsed * (1 - fraction) / fraction
+        print_message.progress(self.done, self.units, triples, triples / elapsed, bytes_rate, eta, end)
+
+
+# results of the index instances (an imap iterator) - the progress is shown every INTERVAL seconds
+# while waiting & after each result
+def results(iterator, progress):
+    while True:
+        try:
+            result = iterator.next(timeout=INTERVAL)
+        except multiprocessing.TimeoutError:
+            progress.show()
+            continue
+        except StopIteration:
+            progress.show("\n")
+            return
+        progress.done += 1
+        yield result
+        progress.show()
@@ -0,0 +1,81 @@
+import os
+import pickle
+from collections import OrderedDict
+
+# bounded LRU cache of resolved resource properties (key: <keywords>_<field>),
+# kept for the whole lifetime of an index instance & optionally persisted between runs (along with a token
+# of the property source, a cache of another source is not loaded)
+
+# approximate memory of an entry besides its strings (dict slot, list, tuple)
+ENTRY_OVERHEAD = 120
+
+
+def entry_size(key, values):
+    size = ENTRY_OVERHEAD + len(key)
+    if values is not None:
+        for value in values:
+            size += len(value)
+    return size
+
+
+class PropertyCache(object):
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # cached values of a key (None for resources without values), default if not cached
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, values):
+        if key in self.entries:
+            self.bytes -= entry_size(key, self.entries[key])
+        self.entries[key] = values
+        self.entries.move_to_end(key)
+        self.bytes += entry_size(key, values)
+
+        # evict least recently used entries
+        while len(self.entries) > self.max_entries or (self.bytes > self.max_bytes and len(self.entries) > 1):
+            old_key, old_values = self.entries.popitem(last=False)
+            self.bytes -= entry_size(old_key, old_values)
+            self.evictions += 1
+
+    # counters since the last call (reset afterwards)
+    def take_stats(self):
+        stats = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        return stats
+
+    # entries saved by a previous run - only loaded if saved with the same token (the state of the property
+    # source they were resolved from), returns whether they were loaded
+    def load(self, path, token):
+        if not os.path.isfile(path):
+            return False
+        with open(path, "rb") as fp:
+            saved = pickle.load(fp)
+        if not isinstance(saved, dict) or saved.get("token") != token:
+            return False
+        for key, values in saved["entries"]:
+            self.put(key, values)
+        self.evictions = 0
+        return True
+
+    def save(self, path, token):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fp:
+            pickle.dump({"token": token, "entries": list(self.entries.items())}, fp,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+
+# local (on-disk) store of resource properties, e.g. rdfs:comment values
+# filled during baseline indexing & read directly by the extended indexing,
+# replacing the per-resource searches over the properties-indexes
+
+# max values returned per (resource, field) - same as the properties-index search size
+MAX_VALUES = 150
+
+# inserts per transaction
+BATCH_SIZE = 3500
+
+
+# create an empty store (removes any previous one)
+def create(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.isfile(path + suffix):
+            os.remove(path + suffix)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE props (resource TEXT, field TEXT, value TEXT, source TEXT)")
+    conn.commit()
+    conn.close()
+
+
+# build the lookup index, called once all writers are finished - entries of chunks
+# indexed again by a resumed run are deduplicated
+def finalize(path, dedup=False):
+    conn = sqlite3.connect(path)
+    if dedup:
+        conn.execute("DELETE FROM props WHERE rowid NOT IN "
+                     "(SELECT MIN(rowid) FROM props GROUP BY resource, field, value, source)")
+    conn.execute("CREATE INDEX IF NOT EXISTS props_lookup ON props (field, resource)")
+    conn.commit()
+    conn.close()
+
+
+# the resources with entries of the given source files (see index/manifest)
+def source_resources(path, sources):
+    resources = set()
+    conn = sqlite3.connect(path)
+    for i in range(0, len(sources), 500):
+        batch = sources[i:i + 500]
+        rows = conn.execute("SELECT DISTINCT resource FROM props WHERE source IN (" + ", ".join("?" * len(batch)) +
+                            ")", batch)
+        resources.update(row[0] for row in rows)
+    conn.close()
+    return resources
+
+
+# remove the entries of the given source files (see index/manifest)
+def delete_sources(path, sources):
+    conn = sqlite3.connect(path)
+    with conn:
+        for i in range(0, len(sources), 500):
+            batch = sources[i:i + 500]
+            conn.execute("DELETE FROM props WHERE source IN (" + ", ".join("?" * len(batch)) + ")", batch)
+    conn.close()
+
+
+def exists(path):
+    return os.path.isfile(path)
+
+
+class PropertyStore(object):
+    def __init__(self, path, readonly=False):
+        if readonly:
+            self.conn = sqlite3.connect("file:" + path + "?mode=ro", uri=True, check_same_thread=False)
+        else:
+            # several index instances write concurrently - wait for the lock
+            self.conn = sqlite3.connect(path, timeout=600, check_same_thread=False)
+            self.conn.execute("PRAGMA synchronous=OFF")
+        self.pending = []
+
+    # buffer a (resource, field, value) entry - source is the file it comes from (if recorded)
+    def add(self, resource, field, value, source=""):
+        self.pending.append((resource, field, value, source))
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT INTO props VALUES (?, ?, ?, ?)", self.pending)
+        del self.pending[0:len(self.pending)]
+
+    # all values of a resource's field, None if there are none
+    def get(self, resource, field):
+        rows = self.conn.execute("SELECT value FROM props WHERE field = ? AND resource = ? LIMIT ?",
+                                 (field, resource, MAX_VALUES)).fetchall()
+        if len(rows) == 0:
+            return None
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
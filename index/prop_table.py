@@ -0,0 +1,143 @@
+import mmap
+import os
+import sqlite3
+import struct
+import zlib
+from array import array
+
+from index import prop_store
+
+# read-only, compact property table (index.prop.table) - built once from the local property store by the
+# extended controller & memory-mapped by every index instance, so the values are held once (in the page
+# cache) whatever the number of instances, instead of per instance
+#
+# file layout (little-endian):
+#   header   magic, number of keys, offset of the hash table, number of slots
+#   records  key length (uint32), number of values (uint32), key (UTF-8: field \0 resource), then per value:
+#            length (uint32) & value (UTF-8) - each key is stored once, with all its values
+#   table    open-addressing hash table (linear probing) of (crc32 of the key, record offset + 1) slots
+
+MAGIC = b"E4RPTBL1"
+HEADER = struct.Struct("<8sQQQ")
+RECORD = struct.Struct("<II")
+LENGTH = struct.Struct("<I")
+SLOT = struct.Struct("<QQ")
+
+# the table is at most half full
+LOAD_FACTOR = 0.5
+
+
+def table_key(resource, field):
+    return (field + "\x00" + resource).encode("utf-8")
+
+
+# the table is (re)built if missing or older than the property store
+def is_stale(path, store_path):
+    return not os.path.isfile(path) or os.path.getmtime(path) < os.path.getmtime(store_path)
+
+
+# builds the table from the property store - returns the number of keys
+def build(store_path, path):
+    conn = sqlite3.connect("file:" + store_path + "?mode=ro", uri=True)
+    hashes = array("Q")
+    offsets = array("Q")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(HEADER.pack(MAGIC, 0, 0, 0))
+
+        # rows are grouped by (field, resource) - read in the order of the lookup index
+        key = None
+        values = []
+        rows = conn.execute("SELECT field, resource, value FROM props ORDER BY field, resource")
+        for field, resource, value in rows:
+            if key is None or key != (field, resource):
+                if key is not None:
+                    write_record(fp, key, values, hashes, offsets)
+                key = (field, resource)
+                values = []
+            if len(values) < prop_store.MAX_VALUES:
+                values.append(value)
+        if key is not None:
+            write_record(fp, key, values, hashes, offsets)
+
+        # hash table of the records
+        slots = 1
+        while slots * LOAD_FACTOR < max(1, len(hashes)):
+            slots *= 2
+        mask = slots - 1
+        table = array("Q", bytes(SLOT.size * slots))
+        for key_hash, offset in zip(hashes, offsets):
+            i = key_hash & mask
+            while table[2 * i + 1] != 0:
+                i = (i + 1) & mask
+            table[2 * i] = key_hash
+            table[2 * i + 1] = offset + 1
+
+        table_offset = fp.tell()
+        table.tofile(fp)
+        fp.seek(0)
+        fp.write(HEADER.pack(MAGIC, len(hashes), table_offset, slots))
+
+    conn.close()
+    os.replace(tmp_path, path)
+    return len(hashes)
+
+
+def write_record(fp, key, values, hashes, offsets):
+    field, resource = key
+    key_bytes = table_key(resource, field)
+    hashes.append(zlib.crc32(key_bytes))
+    offsets.append(fp.tell())
+
+    data = [RECORD.pack(len(key_bytes), len(values)), key_bytes]
+    for value in values:
+        value_bytes = value.encode("utf-8")
+        data.append(LENGTH.pack(len(value_bytes)))
+        data.append(value_bytes)
+    fp.write(b"".join(data))
+
+
+# the table of an index instance - same lookups as prop_store.PropertyStore
+class PropertyTable(object):
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            self.map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.keys, self.table_offset, slots = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(path + " is not a property table")
+        self.mask = slots - 1
+
+    # all values of a resource's field, None if there are none
+    def get(self, resource, field):
+        key_bytes = table_key(resource, field)
+        key_hash = zlib.crc32(key_bytes)
+        i = key_hash & self.mask
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self.map, self.table_offset + i * SLOT.size)
+            if offset == 0:
+                return None
+            if slot_hash == key_hash:
+                values = self.record_values(offset - 1, key_bytes)
+                if values is not None:
+                    return values
+            i = (i + 1) & self.mask
+
+    # values of the record at offset, None if its key differs (hash collision)
+    def record_values(self, offset, key_bytes):
+        key_length, count = RECORD.unpack_from(self.map, offset)
+        pos = offset + RECORD.size
+        if key_length != len(key_bytes) or self.map[pos:pos + key_length] != key_bytes:
+            return None
+        pos += key_length
+
+        values = []
+        for _ in range(count):
+            length, = LENGTH.unpack_from(self.map, pos)
+            pos += LENGTH.size
+            values.append(self.map[pos:pos + length].decode("utf-8"))
+            pos += length
+        return values
+
+    def close(self):
+        self.map.close()
@@ -0,0 +1,46 @@
+import json
+import os
+
+# size-aware scheduling of the units of an indexing process (baseline, extended) - units are dispatched
+# one at a time, the longest first, so that a big unit is not left to a single index instance at the end
+# of the run while the others are idle
+#
+# the duration of each unit is recorded in a local file (index.schedule, kept across runs) & plans the
+# next run - units without a recorded duration are estimated from their bytes, at the median seconds per
+# byte of the recorded ones (the bytes alone, if there are none)
+
+
+def load(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as fp:
+        return json.load(fp)
+
+
+class Schedule(object):
+    def __init__(self, path, process):
+        self.path = path
+        self.process = process
+        self.state = load(path)
+        self.durations = self.state.setdefault(process, {})
+
+    # units in dispatch order, longest first - key & size are functions of a unit
+    def order(self, units, key, size):
+        rates = sorted(self.durations[key(unit)] / size(unit) for unit in units
+                       if key(unit) in self.durations and size(unit) > 0)
+        rate = rates[len(rates) // 2] if len(rates) != 0 else 1.0
+
+        def estimate(unit):
+            return self.durations.get(key(unit), size(unit) * rate)
+
+        return sorted(units, key=estimate, reverse=True)
+
+    def record(self, key, seconds):
+        self.durations[key] = round(seconds, 3)
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(self.state, fp)
+        os.replace(tmp_path, self.path)
@@ -2,10 +2,12 @@ import argparse
 import json
 import os
 import sys, csv
+from timeit import default_timer as timer
 
 import el_controller
 import elasticsearch
-from index import mappings, baseline, extended, print_message
+from index import mappings, baseline, extended, print_message, prop_store, checkpoint, manifest, chunks, metrics, \
+    export, namespaces, entity
 
 
 # configuration file object
@@ -16,6 +18,12 @@ class Configuration(object):
         self.inc_uris = True
         self.inc_nspace = False
         self.prop = False
+        self.prop_index = True
+        self.prop_store = ""
+        self.prop_table = ""
+
+        self.entity = False
+        self.entity_index = "entindex"
 
         self.ext = False
         self.ext_index = ""
@@ -23,12 +31,47 @@ class Configuration(object):
         self.ext_inc_sub = True
         self.ext_inc_pre = True
         self.ext_inc_obj = True
+        self.ext_namespaces = list(namespaces.DEFAULT)
+        self.ext_discover = ""
+        self.ext_source = "rdf"
+        self.ext_slices = 0
+        self.cache_entries = 1000000
+        self.cache_bytes = 512 * 1024 * 1024
+        self.cache_dir = ""
 
         self.dataset_id = ""
         self.rdf_dir = ""
         self.instances = 5
+        self.chunk_size = 256 * 1024 * 1024
+        self.decompress_thread = True
+        self.pipeline = False
+        self.engine = "sync"
+        self.engine_lookups = 4
+        self.engine_bulks = 4
+        self.state_file = "state.json"
+        self.schedule_file = "schedule.json"
+        self.resume = False
+        self.manifest = ""
+        self.delta = False
+        self.delta_files = None
+        self.delta_resources = []
+        self.export = ""
+        self.export_compress = "gz"
+        self.export_shard_bytes = 256 * 1024 * 1024
+        self.bulk_load = False
+        self.force_merge = False
         self.elastic_address = "http://localhost"
         self.elastic_port = "9200"
+        self.elastic_connections = 10
+        self.elastic_sniff = False
+        self.elastic_compress = False
+        self.bulk_size = 3500
+        self.bulk_bytes = 10 * 1024 * 1024
+        self.bulk_threads = 2
+        self.bulk_adaptive = True
+        self.bulk_latency = 1000
+        self.bulk_retries = 5
+        self.dead_letter = "dead_letter.ndjson"
 
         self.verbose = False
 
@@ -84,6 +127,35 @@ def init_config_file(cfile):
                         1] + ' not recognized.')
                     sys.exit(-1)
 
+            elif line[0] == "index.prop.index":
+                if line[1] == "yes":
+                    config.prop_index = True
+                elif line[1] == "no":
+                    config.prop_index = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.prop.store":
+                config.prop_store = line[1]
+
+            elif line[0] == "index.prop.table":
+                config.prop_table = line[1]
+
+            elif line[0] == "index.entity":
+                if line[1] == "yes":
+                    config.entity = True
+                elif line[1] == "no":
+                    config.entity = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.entity.name":
+                config.entity_index = line[1]
+
             elif line[0] == "index.ext":
                 if line[1] == "yes":
                     config.ext = True
@@ -144,6 +216,47 @@ def init_config_file(cfile):
                         1] + ' not recognized.')
                     sys.exit(-1)
 
+            elif line[0] == "index.ext.namespaces":
+                config.ext_namespaces = [namespace for namespace in line[1].rsplit(" ") if namespace]
+
+            elif line[0] == "index.ext.namespaces.discover":
+                config.ext_discover = line[1]
+
+            elif line[0] == "index.ext.source":
+                if line[1] == "rdf" or line[1] == "baseline":
+                    config.ext_source = line[1]
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.ext.slices":
+                try:
+                    config.ext_slices = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.ext.cache.entries":
+                try:
+                    config.cache_entries = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.ext.cache.bytes":
+                try:
+                    config.cache_bytes = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.ext.cache.dir":
+                config.cache_dir = line[1]
+
             elif line[0] == "index.data":
                 if os.path.isdir(line[1]):
                     config.rdf_dir = line[1]
@@ -160,6 +273,106 @@ def init_config_file(cfile):
                         1] + ' not an integer')
                     sys.exit(-1)
 
+            elif line[0] == "index.chunk_size":
+                try:
+                    config.chunk_size = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.decompress_thread":
+                if line[1] == "yes":
+                    config.decompress_thread = True
+                elif line[1] == "no":
+                    config.decompress_thread = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.pipeline":
+                if line[1] == "yes":
+                    config.pipeline = True
+                elif line[1] == "no":
+                    config.pipeline = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.engine":
+                if line[1] == "sync" or line[1] == "async":
+                    config.engine = line[1]
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.engine.lookups":
+                try:
+                    config.engine_lookups = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.engine.bulks":
+                try:
+                    config.engine_bulks = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.state":
+                config.state_file = line[1]
+
+            elif line[0] == "index.schedule":
+                config.schedule_file = line[1]
+
+            elif line[0] == "index.manifest":
+                config.manifest = line[1]
+
+            elif line[0] == "index.export":
+                config.export = line[1]
+
+            elif line[0] == "index.export.compress":
+                if line[1] in export.COMPRESSION:
+                    config.export_compress = line[1]
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.export.shard_bytes":
+                try:
+                    config.export_shard_bytes = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "index.bulk_load":
+                if line[1] == "yes":
+                    config.bulk_load = True
+                elif line[1] == "no":
+                    config.bulk_load = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "index.bulk_load.force_merge":
+                if line[1] == "yes":
+                    config.force_merge = True
+                elif line[1] == "no":
+                    config.force_merge = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
             elif line[0] == "elastic.address":
                 config.elastic_address = line[1]
 
@@ -171,6 +384,87 @@ def init_config_file(cfile):
                         1] + ' not an integer')
                     sys.exit(-1)
 
+            elif line[0] == "elastic.connections":
+                try:
+                    config.elastic_connections = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.sniff":
+                if line[1] == "yes":
+                    config.elastic_sniff = True
+                elif line[1] == "no":
+                    config.elastic_sniff = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.compress":
+                if line[1] == "yes":
+                    config.elastic_compress = True
+                elif line[1] == "no":
+                    config.elastic_compress = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.size":
+                try:
+                    config.bulk_size = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.bytes":
+                try:
+                    config.bulk_bytes = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.threads":
+                try:
+                    config.bulk_threads = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.adaptive":
+                if line[1] == "yes":
+                    config.bulk_adaptive = True
+                elif line[1] == "no":
+                    config.bulk_adaptive = False
+                else:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[0] + " " + line[
+                        1] + ' not recognized.')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.latency":
+                try:
+                    config.bulk_latency = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.retries":
+                try:
+                    config.bulk_retries = int(line[1])
+                except ValueError:
+                    print('Error,' + '\'' + cfile + '\'' + ' is not a proper config file: ' + line[
+                        1] + ' not an integer')
+                    sys.exit(-1)
+
+            elif line[0] == "elastic.bulk.dead_letter":
+                config.dead_letter = line[1]
+
             elif line[0] == "verbose":
                 if line[1] == "yes":
                     config.verbose = True
@@ -189,41 +483,245 @@ def init_config_file(cfile):
     return config
 
 
+# create an index - a resumed or delta run keeps the existing one
+def create_index(config, index_name, index_map):
+    if (config.resume or config.delta) and el_controller.index_exists(index_name):
+        return
+    el_controller.create_index(index_name, index_map)
+
+
+# the indexes to be created (name -> mapping)
+def index_mappings(config):
+    indexes = {}
+    if config.base:
+        indexes[config.base_index] = mappings.get_baseline(config)
+        if config.prop and config.prop_index:
+            for field in config.ext_fields.keys():
+                indexes[field] = mappings.get_properties(config, field)
+
+    if config.entity:
+        indexes[config.entity_index] = mappings.get_entity(config)
+
+    if config.ext:
+        indexes[config.ext_index] = mappings.get_extended(config)
+    return indexes
+
+
 # create the ElasticSearch indexes - mappings
 def create_indexes(config):
     try:
-        if config.base:
-            # get mapping & create index
-            base_map = mappings.get_baseline(config)
-            el_controller.create_index(config.base_index, base_map)
-
-            if config.prop:
-                for field in config.ext_fields.keys():
-                    prop_map = mappings.get_properties(field)
-                    el_controller.create_index(field, prop_map)
+        for index_name, index_map in index_mappings(config).items():
+            create_index(config, index_name, index_map)
 
-        # create extended & properties indexes
-        if config.ext:
-            ext_map = mappings.get_extended(config)
-            el_controller.create_index(config.ext_index, ext_map)
+        # the scripts merging the entity-docs of a subject across files
+        if config.entity:
+            for script_id, source in entity.SCRIPTS.items():
+                el_controller.put_script(script_id, source)
 
     except elasticsearch.ElasticsearchException as e:
         print('Elas4RDF error: could not create indexes: ' + str(e))
         exit(-1)
 
 
-# starts indexing for baseline
+# index settings while bulk-loading (no refreshes, no replicas, async translog)
+BULK_LOAD_SETTINGS = {"index": {"refresh_interval": "-1", "number_of_replicas": 0, "translog.durability": "async"}}
+
+# (phase, elapsed time) of bulk-load mode
+phase_times = []
+
+
+# the configured settings (res/mapping/*.json) of an index, restored after bulk-loading
+def configured_settings(index_map):
+    index_settings = index_map['settings']['index']
+    return {"index": {"refresh_interval": index_settings.get("refresh_interval", "1s"),
+                      "number_of_replicas": index_settings.get("number_of_replicas", 1),
+                      "translog.durability": index_settings.get("translog.durability", "request")}}
+
+
+# runs an indexing process - in bulk-load mode the indexes (name -> mapping) are tuned for ingestion,
+# optionally force-merged & their configured settings are restored at the end
+# returns whether all chunks were indexed
+def run_indexing(config, name, indexes, index_function):
+    if not config.bulk_load:
+        return index_function(config)
+
+    try:
+        try:
+            start = timer()
+            for index_name in indexes.keys():
+                el_controller.put_settings(index_name, BULK_LOAD_SETTINGS)
+            phase_times.append((name + " - tune settings", timer() - start))
+
+            start = timer()
+            completed = index_function(config)
+            phase_times.append((name + " - ingestion", timer() - start))
+
+            start = timer()
+            for index_name in indexes.keys():
+                el_controller.refresh(index_name)
+            phase_times.append((name + " - refresh", timer() - start))
+
+            # merge before replicas are restored, so that merged segments are replicated
+            if config.force_merge:
+                start = timer()
+                for index_name in indexes.keys():
+                    el_controller.force_merge(index_name, 1)
+                phase_times.append((name + " - force-merge", timer() - start))
+
+        # the configured settings are restored even if the ingestion failed
+        finally:
+            start = timer()
+            restore_settings(indexes)
+            phase_times.append((name + " - restore settings", timer() - start))
+
+        return completed
+
+    except elasticsearch.ElasticsearchException as e:
+        print('Elas4RDF error: bulk-load settings of ' + str(list(indexes.keys())) + ' failed: ' + str(e))
+        exit(-1)
+
+
+# restores the configured settings of bulk-loaded indexes - a failure is reported, not raised, so that
+# it does not hide the error of the ingestion (if any)
+def restore_settings(indexes):
+    for index_name, index_map in indexes.items():
+        try:
+            el_controller.put_settings(index_name, configured_settings(index_map))
+        except elasticsearch.ElasticsearchException as e:
+            print('Elas4RDF error: could not restore the settings of \'' + index_name + '\': ' + str(e))
+
+
+# starts indexing for baseline (& entity)
 def index_baseline(config):
-    baseline.controller(config)
+    indexes = {}
+    if config.base:
+        indexes[config.base_index] = mappings.get_baseline(config)
+        if config.prop and config.prop_index:
+            for field in config.ext_fields.keys():
+                indexes[field] = mappings.get_properties(config, field)
+    if config.entity:
+        indexes[config.entity_index] = mappings.get_entity(config)
+
+    return run_indexing(config, "baseline", indexes, baseline.controller)
 
 
 # starts indexing for extended
 def index_extended(config):
-    extended.controller(config)
+    indexes = {config.ext_index: mappings.get_extended(config)}
+
+    return run_indexing(config, "extended", indexes, extended.controller)
+
+
+# compares the dataset with its manifest (index.manifest) - a delta run deletes the docs of changed & removed
+# files and indexes only new & changed files, returns the entries of the new manifest
+def compare_manifest(config):
+    all_files = chunks.list_files(config.rdf_dir)
+    entries, new, changed, removed = manifest.compare(manifest.load(config.manifest), all_files,
+                                                      config.rdf_dir, config.chunk_size, config.entity)
+    if not config.delta:
+        return entries
 
+    print_message.delta_starting(len(new), len(changed), len(removed), len(entries) - len(new) - len(changed))
+    delete_sources(config, [manifest.source(path, config.rdf_dir) for path in changed] + removed)
+    config.delta_files = set(new + changed)
+    return entries
+
+
+# deletes the docs of the given files (sourceFile) from all indexes - files already handled
+# by an interrupted delta run are skipped when resumed
+def delete_sources(config, sources):
+    index_names = []
+    if config.base:
+        index_names.append(config.base_index)
+        if config.prop and config.prop_index:
+            index_names.extend(config.ext_fields.keys())
+    if config.entity:
+        index_names.append(config.entity_index)
+    if config.ext:
+        index_names.append(config.ext_index)
+
+    progress = checkpoint.Checkpoint(config.state_file, "delta")
+    for source in sources:
+        if progress.has(source):
+            continue
+        try:
+            # the resources whose properties are deleted - recorded with the progress, until re-enriched
+            progress.add_all([RESOURCE_KEY + resource for resource in source_resources(config, [source])])
+
+            deleted = 0
+            for index_name in index_names:
+                # entity-docs are merged across files - only the runs of the file are removed
+                if config.entity and index_name == config.entity_index:
+                    deleted += el_controller.update_by_query(
+                        index_name, {"term": {"sourceFile": source}},
+                        {"id": entity.REMOVE_SCRIPT_ID, "params": {"sourceFile": source}})
+                else:
+                    deleted += el_controller.delete_by_query(index_name, {"term": {"sourceFile": source}})
+        except elasticsearch.ElasticsearchException as e:
+            print('Elas4RDF error: could not delete the docs of \'' + source + '\': ' + str(e))
+            exit(-1)
+
+        if config.base and config.prop and config.prop_store and prop_store.exists(config.prop_store):
+            prop_store.delete_sources(config.prop_store, [source])
+
+        progress.add(source)
+        if config.verbose:
+            print("\t " + source + ": " + str(deleted) + " docs deleted")
+
+
+# resources whose properties come from the given files (property store & properties-indexes), if the
+# properties are indexed by this run - the extended docs of unchanged files referring to them are enriched
+# again by a delta run
+def source_resources(config, sources):
+    resources = set()
+    if not (config.base and config.prop and config.ext) or len(sources) == 0:
+        return resources
+
+    if config.prop_store and prop_store.exists(config.prop_store):
+        resources.update(prop_store.source_resources(config.prop_store, sources))
+    if config.prop_index:
+        for field in config.ext_fields.keys():
+            if not el_controller.index_exists(field):
+                continue
+            el_controller.refresh(field)
+            for hits in el_controller.scroll_slice(field, {"terms": {"sourceFile": sources}}, 0, 1, config.bulk_size):
+                resources.update(hit["_source"]["resource_terms"] for hit in hits)
+    return resources
+
+
+# resources of the delta progress (see delete_sources)
+RESOURCE_KEY = "resource:"
+
+
+# resources whose properties were changed by a delta run - deleted with changed & removed files, or
+# added by new & changed files
+def delta_resources(config):
+    progress = checkpoint.Checkpoint(config.state_file, "delta")
+    resources = set(key[len(RESOURCE_KEY):] for key in progress.done if key.startswith(RESOURCE_KEY))
+    try:
+        resources.update(source_resources(config, [manifest.source(path, config.rdf_dir)
+                                                   for path in config.delta_files]))
+    except elasticsearch.ElasticsearchException as e:
+        print('Elas4RDF error: could not read the properties of the changed files: ' + str(e))
+        exit(-1)
+    return sorted(resources)
 
-# verifies properties-indexes exist before starting extended
+
+# verifies properties-indexes (or the local property store) exist before starting extended - and the
+# baseline index, if the extended index is derived from it (index.ext.source=baseline)
 def properties_exist(config):
+    if config.ext_source == "baseline" and not el_controller.index_exists(config.base_index):
+        print('Elas4RDF error, could not create \'' + str(config.ext_index) + '\'.'
+              ' Missing baseline index: \'' + config.base_index + '\'. Start baseline indexing process again.')
+        return False
+
+    if config.prop_store:
+        if not prop_store.exists(config.prop_store):
+            print('Elas4RDF error, could not create \'' + str(config.ext_index) + '\'.'
+                  ' Missing property store: \'' + config.prop_store + '\'. Start baseline indexing process again.')
+            return False
+        return True
+
     exist = True
     index_missing = []
     for field in config.ext_fields.keys():
@@ -248,8 +746,10 @@ def output_properties(config):
 
     if config.ext:
         index = config.ext_index
-    else:
+    elif config.base or not config.entity:
         index = config.base_index
+    else:
+        index = config.entity_index
 
     if config.inc_uris:
         fields["subjectKeywords"] = 1
@@ -274,44 +774,133 @@ def output_properties(config):
     conf_dict["index.name"] = index
     conf_dict["index.fields"] = fields
 
+    # the entity-centric index (a doc per subject)
+    if config.entity:
+        entity_fields = {}
+        if config.inc_uris:
+            entity_fields["subjectKeywords"] = 1
+            entity_fields["predicateKeywords"] = 1
+            entity_fields["objectKeywords"] = 2
+        if config.inc_nspace:
+            entity_fields["subjectNspaceKeys"] = 1
+            entity_fields["predicateNspaceKeys"] = 1
+            entity_fields["objectNspaceKeys"] = 1
+        conf_dict["entity.index.name"] = config.entity_index
+        conf_dict["entity.index.fields"] = entity_fields
+
     output.write(json.dumps(conf_dict, indent=4, sort_keys=False))
 
     return os.path.abspath(output_name)
 
 
+# initialize & basic configuration
+def init_elastic(config):
+    try:
+        el_controller.init(config.elastic_address.split(","), config.elastic_port, config.elastic_connections,
+                           config.elastic_sniff, config.elastic_compress)
+        el_controller.init_bulk(config.bulk_adaptive, config.bulk_latency / 1000.0, config.bulk_retries,
+                                config.dead_letter)
+    except elasticsearch.ElasticsearchException as e:
+        print('Elas4RDF error: could not initialize Elasticsearch: ' + str(e))
+
+
 def main():
     # setting up arguments parser
     parser = argparse.ArgumentParser(description='\'Indexer for generating the baseline and/or extended index\'')
     parser.add_argument('-config', help='"specify the config file(.tsv)', required=True)
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='"resume an interrupted run, skipping the chunks already indexed (see index.state)')
+    parser.add_argument('-delta', '--delta', action='store_true',
+                        help='"index only the files changed since the last run (see index.manifest)')
     args = vars(parser.parse_args())
 
     # read configuration file
     config = init_config_file(args['config'])
+    config.resume = args['resume']
+    config.delta = args['delta']
+
+    if config.resume and not os.path.isfile(config.state_file):
+        print('Elas4RDF error: nothing to resume, state file \'' + config.state_file + '\' does not exist.')
+        sys.exit(-1)
+
+    if config.delta and not (config.manifest and os.path.isfile(config.manifest)):
+        print('Elas4RDF error: no delta run without a manifest, index.manifest \'' + config.manifest +
+              '\' does not exist.')
+        sys.exit(-1)
+
+    if chunks.zstandard is None and any(path.endswith(".zst") for path in chunks.list_files(config.rdf_dir)):
+        print('Elas4RDF error: .nt.zst input files require the zstandard package (pip install zstandard).')
+        sys.exit(-1)
+
+    if config.export:
+        if config.delta:
+            print('Elas4RDF error: no delta run with an offline export (index.export), the docs of changed files '
+                  'are deleted from the indexes.')
+            sys.exit(-1)
+        if config.ext and not config.prop_store:
+            print('Elas4RDF error: an offline export (index.export) of the extended index requires the local '
+                  'property store (index.prop.store).')
+            sys.exit(-1)
+        if config.ext and config.ext_source == "baseline":
+            print('Elas4RDF error: an offline export (index.export) cannot read the baseline index '
+                  '(index.ext.source=baseline).')
+            sys.exit(-1)
+        if config.export_compress == "zst" and chunks.zstandard is None:
+            print('Elas4RDF error: index.export.compress=zst requires the zstandard package (pip install zstandard).')
+            sys.exit(-1)
+        # the ingestion settings are applied by the loader
+        config.bulk_load = False
 
     # print verification message
     print_message.verification_message(config)
 
-    # initialize & basic configuration
-    try:
-        el_controller.init(config.elastic_address, config.elastic_port)
-    except elasticsearch.ElasticsearchException as e:
-        print('Elas4RDF error: could not initialize Elasticsearch: ' + str(e))
+    if config.export:
+        # no cluster - the mappings are exported along with the shards, the loader creates the indexes
+        export.save_indexes(config.export, index_mappings(config))
+    else:
+        init_elastic(config)
 
-    # create index mappings & structures
-    create_indexes(config)
+        # create index mappings & structures
+        create_indexes(config)
+
+    # a new run starts without progress
+    if not config.resume:
+        checkpoint.reset(config.state_file)
+
+    # compare with the manifest of the last run (delta run: delete the docs of changed files)
+    if config.manifest:
+        manifest_entries = compare_manifest(config)
 
     # start indexing
-    if config.base:
-        index_baseline(config)
+    completed = True
+    if config.base or config.entity:
+        completed = index_baseline(config) and completed
     if config.ext:
         if properties_exist(config):
-            index_extended(config)
+            if config.delta:
+                config.delta_resources = delta_resources(config)
+            completed = index_extended(config) and completed
         else:
             exit(-1)
 
+    # the manifest is updated once all files are indexed
+    if config.manifest:
+        if completed:
+            manifest.save(config.manifest, manifest_entries)
+        else:
+            print("Elas4RDF: some chunks were not indexed, manifest \'" + config.manifest + "\' not updated "
+                  "(run again with -resume)")
+
+    if config.bulk_load:
+        print_message.bulk_load_report(phase_times)
+
     # generate .config output file
     file_path = output_properties(config)
 
+    # stage metrics report, next to the output file
+    report_paths = metrics.write_report(os.path.dirname(file_path))
+    print_message.metrics_report(metrics.totals, report_paths)
+
     print_message.finished(file_path)
 
 
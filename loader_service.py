@@ -0,0 +1,148 @@
+import argparse
+import os
+import sys
+from timeit import default_timer as timer
+
+import el_controller
+import elasticsearch
+import indexer_service
+from index import export, checkpoint, chunks, metrics, print_message, pipeline, entity
+
+# loads an offline export (index.export) into ES - creates the exported indexes (if missing) & sends the
+# bulk NDJSON shards, without parsing the RDF data again. Shards are loaded in parallel by index.instances
+# processes, each with elastic.bulk.threads bulk requests in flight (elastic.* options of -config)
+#
+# the shards already loaded are recorded in the export directory (load_state.json), an interrupted
+# load can be resumed with -resume - a load started again replays all shards (doc ids are stable)
+#   python3 loader_service.py -config <file.properties> [-input <export_dir>] [-resume]
+
+STATE_FILE = "load_state.json"
+
+
+# loads a shard - returns the shard, whether it was fully loaded, the (success, failed) docs & the stage metrics
+def load_shard(path):
+    completed = True
+    success, failed = 0, 0
+
+    if config.verbose:
+        print("\t " + path + ": started")
+
+    try:
+        success, failed = el_controller.bulk_docs(export.read_docs(path, config.decompress_thread),
+                                                  config.bulk_size, config.bulk_bytes, config.bulk_threads)
+        # failed docs are recorded in the dead-letter file, the shard is not loaded again
+        if failed != 0:
+            print("Elas4RDF: " + str(failed) + " docs could not be indexed (see " + config.dead_letter +
+                  "), in shard: " + path)
+
+    except elasticsearch.ElasticsearchException as e:
+        completed = False
+        print("Elas4RDF: Exception occured (skipping rest of shard), in shard: " + path)
+        if config.verbose:
+            print(str(e))
+
+    return path, completed, (success, failed), metrics.take()
+
+
+# initialize a load instance - creates its ES client
+def init_instance():
+    el_controller.init_worker()
+
+
+def controller(config_f):
+    global config
+    config = config_f
+
+    shards = export.list_shards(input_dir)
+    progress = checkpoint.Checkpoint(os.path.join(input_dir, STATE_FILE), "load")
+    pending_shards = [path for path in shards if not progress.has(path)]
+    if len(pending_shards) != len(shards):
+        print("\t resuming, shards already loaded: " + str(len(shards) - len(pending_shards)))
+    # the largest shards first, one at a time
+    pending_shards.sort(key=os.path.getsize, reverse=True)
+
+    start = timer()
+    success, failed = 0, 0
+    p = pipeline.instances(config, init_instance)
+    all_completed = True
+    for i, (path, completed, counts, stats) in enumerate(p.imap_unordered(load_shard, pending_shards, chunksize=1)):
+        metrics.merge("load", stats)
+        success, failed = success + counts[0], failed + counts[1]
+        if completed:
+            progress.add(path)
+        else:
+            all_completed = False
+        print("\t Shards : " + str(i + 1) + " / " + str(len(pending_shards)) + " , docs loaded: " + str(success) +
+              "\r", end="")
+    p.close()
+    p.join()
+
+    print()
+    print_message.load_finished(str(timer() - start), success, failed)
+    return all_completed
+
+
+# creates the exported indexes - existing indexes are kept, loaded docs overwrite theirs. The scripts of the
+# entity-docs (updates of the exported entity index) are put as well
+def create_indexes(indexes):
+    try:
+        for index_name, index_map in indexes.items():
+            if not el_controller.index_exists(index_name):
+                el_controller.create_index(index_name, index_map)
+        for script_id, source in entity.SCRIPTS.items():
+            el_controller.put_script(script_id, source)
+    except elasticsearch.ElasticsearchException as e:
+        print('Elas4RDF error: could not create indexes: ' + str(e))
+        exit(-1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='\'Loader of an offline export (bulk NDJSON shards) into ES\'')
+    parser.add_argument('-config', help='"specify the config file(.tsv), elastic.* options', required=True)
+    parser.add_argument('-input', help='"export directory (defaults to index.export of -config)')
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='"resume an interrupted load, skipping the shards already loaded')
+    args = vars(parser.parse_args())
+
+    config = indexer_service.init_config_file(args['config'])
+
+    global input_dir
+    input_dir = args['input'] or config.export
+    if not input_dir or not os.path.isdir(input_dir):
+        print('Elas4RDF error: export directory \'' + str(input_dir) + '\' does not exist (see -input, index.export).')
+        sys.exit(-1)
+
+    shards = export.list_shards(input_dir)
+    indexes = export.load_indexes(input_dir)
+    if len(shards) == 0 or len(indexes) == 0:
+        print('Elas4RDF error: no exported shards or indexes (' + export.INDEXES_FILE + ') found in \'' +
+              input_dir + '\'')
+        sys.exit(-1)
+
+    if chunks.zstandard is None and any(path.endswith(".zst") for path in shards):
+        print('Elas4RDF error: .ndjson.zst shards require the zstandard package (pip install zstandard).')
+        sys.exit(-1)
+
+    print_message.load_starting(input_dir, len(shards), indexes.keys())
+
+    indexer_service.init_elastic(config)
+
+    create_indexes(indexes)
+
+    # a new load starts without progress
+    if not args['resume']:
+        checkpoint.reset(os.path.join(input_dir, STATE_FILE))
+
+    completed = indexer_service.run_indexing(config, "load", indexes, controller)
+    if not completed:
+        print("Elas4RDF: some shards were not loaded (run again with -resume)")
+
+    if config.bulk_load:
+        print_message.bulk_load_report(indexer_service.phase_times)
+
+    report_paths = metrics.write_report(os.getcwd())
+    print_message.metrics_report(metrics.totals, report_paths)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer as timer
+from multiprocessing import Pool
+
+from index import chunks
+
+# optional preprocessing of unsorted N-Triples input - sorts each input file by line (external merge
+# sort, within a memory budget), so that the triples of a subject are consecutive: subject runs, whose
+# '_sub' properties the extended indexing resolves & builds once per run (as in the sorted DBpedia dumps)
+#
+# each file is sorted on its own (the docs of a file keep their sourceFile), into a plain .nt file at the
+# same relative path of the output directory - duplicate lines are dropped
+#   python3 sort_service.py -input <RDF_dir> -output <dir> [-memory <bytes>] [-instances <number>]
+
+# sorted runs of at most ~memory bytes (per instance) are merged at the end
+DEFAULT_MEMORY = 512 * 1024 * 1024
+
+
+# output path (plain .nt) of an input file
+def sorted_path(path, input_dir, output_dir):
+    name = os.path.relpath(path, input_dir)
+    for extension in chunks.COMPRESSED:
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    return os.path.join(output_dir, name)
+
+
+def write_run(lines, tmp_dir):
+    lines.sort()
+    fd, run_path = tempfile.mkstemp(suffix=".run", dir=tmp_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as fp:
+        fp.writelines(lines)
+    return run_path
+
+
+# sorts an input file - returns the input & output paths, the lines written & elapsed time
+def sort_file(task):
+    path, output_path, memory = task
+    start = timer()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".sort-", dir=os.path.dirname(output_path))
+    try:
+        # sorted runs of ~memory bytes (str size)
+        run_paths = []
+        lines = []
+        size = 0
+        for line in chunks.read_lines((path, 0, os.path.getsize(path))):
+            if not line.endswith("\n"):
+                line += "\n"
+            lines.append(line)
+            size += sys.getsizeof(line)
+            if size >= memory:
+                run_paths.append(write_run(lines, tmp_dir))
+                lines = []
+                size = 0
+        if len(lines) != 0 or len(run_paths) == 0:
+            run_paths.append(write_run(lines, tmp_dir))
+
+        # merge the runs, dropping duplicate lines
+        written = 0
+        runs = [open(run_path, encoding="utf-8") for run_path in run_paths]
+        try:
+            with open(output_path + ".tmp", "w", encoding="utf-8") as out:
+                previous = None
+                for line in heapq.merge(*runs):
+                    if line != previous:
+                        out.write(line)
+                        written += 1
+                        previous = line
+        finally:
+            for run in runs:
+                run.close()
+        os.replace(output_path + ".tmp", output_path)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    return path, output_path, written, timer() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='\'Sorts N-Triples files by subject (external merge sort)\'')
+    parser.add_argument('-input', help='"input directory (.nt, .nt.gz, .nt.bz2, .nt.zst files)', required=True)
+    parser.add_argument('-output', help='"output directory of the sorted .nt files', required=True)
+    parser.add_argument('-memory', type=int, default=DEFAULT_MEMORY,
+                        help='"memory (bytes) of the sorted runs, per instance')
+    parser.add_argument('-instances', type=int, default=1, help='"files sorted in parallel')
+    args = parser.parse_args()
+
+    files = chunks.list_files(args.input)
+    if len(files) == 0:
+        print('Elas4RDF error: No RDF files (.nt, .nt.gz, .nt.bz2, .nt.zst) found in the specified folder')
+        sys.exit(-1)
+
+    if os.path.abspath(args.input) == os.path.abspath(args.output):
+        print('Elas4RDF error: the output directory must differ from the input directory')
+        sys.exit(-1)
+
+    if chunks.zstandard is None and any(path.endswith(".zst") for path in files):
+        print('Elas4RDF error: .nt.zst input files require the zstandard package (pip install zstandard).')
+        sys.exit(-1)
+
+    print("Elas4RDF: Sorting " + str(len(files)) + " files into: " + args.output)
+    tasks = [(path, sorted_path(path, args.input, args.output), args.memory) for path in files]
+    start = timer()
+    with Pool(args.instances) as p:
+        for path, output_path, written, elapsed in p.imap_unordered(sort_file, tasks):
+            print("\t " + path + " -> " + output_path + " (" + str(written) + " lines, " +
+                  "{:.2f}".format(elapsed) + " sec)")
+
+    print("Elas4RDF: Finished sorting, elapsed time " + "{:.2f}".format(timer() - start) + " sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import gzip
+import os
+import random
+import tempfile
+import unittest
+
+from index import chunks
+
+
+def triple_lines(subjects, rng):
+    lines = []
+    for s in range(subjects):
+        for t in range(rng.randint(1, 12)):
+            lines.append("<http://x.org/s" + str(s) + "> <http://x.org/p> \"" + "v" * rng.randint(0, 80) + "\" .\n")
+    return lines
+
+
+class PlanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, lines, end=""):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write("".join(lines) + end)
+        return path
+
+    def assert_covers(self, path, units):
+        size = os.path.getsize(path)
+        with open(path, "rb") as fp:
+            data = fp.read()
+        self.assertEqual(units[0][1], 0)
+        self.assertEqual(units[-1][2], size)
+        for (_, start, end), (_, next_start, _) in zip(units, units[1:]):
+            self.assertEqual(end, next_start)
+        for _, start, end in units:
+            self.assertLess(start, end)
+            # chunks start at the beginning of a line
+            self.assertTrue(start == 0 or data[start - 1:start] == b"\n")
+
+        # the chunks' lines are the file's lines, each one read once
+        lines = [line for unit in units for line in chunks.read_lines(unit)]
+        self.assertEqual("".join(lines), data.decode("utf-8"))
+
+    def test_covers_file(self):
+        rng = random.Random(1)
+        path = self.write("a.nt", triple_lines(300, rng))
+        for chunk_size in (1, 50, 333, 4096, os.path.getsize(path) - 1):
+            units = chunks.plan([path], chunk_size)
+            self.assertTrue(all(unit[0] == path for unit in units))
+            self.assert_covers(path, units)
+
+    def test_no_trailing_newline(self):
+        last = "<http://x.org/last> <http://x.org/p> \"x\" ."
+        path = self.write("a.nt", triple_lines(20, random.Random(2)), end=last)
+        self.assert_covers(path, chunks.plan([path], 100))
+
+    def test_whole_files(self):
+        path = self.write("a.nt", triple_lines(20, random.Random(3)))
+        size = os.path.getsize(path)
+        self.assertEqual(chunks.plan([path], 0), [(path, 0, size)])
+        self.assertEqual(chunks.plan([path], size), [(path, 0, size)])
+
+        gz_path = os.path.join(self.tmp.name, "b.nt.gz")
+        with gzip.open(gz_path, "wt", encoding="utf-8") as fp:
+            fp.write("".join(triple_lines(20, random.Random(4))))
+        self.assertEqual(chunks.plan([gz_path], 10), [(gz_path, 0, os.path.getsize(gz_path))])
+
+    def test_subject_runs(self):
+        rng = random.Random(5)
+        path = self.write("a.nt", triple_lines(300, rng))
+        for chunk_size in (1, 100, 700, 5000):
+            units = chunks.plan([path], chunk_size, subject_runs=True)
+            self.assert_covers(path, units)
+
+            # each subject is found in a single chunk
+            chunk_of = {}
+            for i, unit in enumerate(units):
+                for line in chunks.read_lines(unit):
+                    subject = line.split(None, 1)[0]
+                    self.assertEqual(chunk_of.setdefault(subject, i), i)
+
+    def test_run_end(self):
+        lines = ["<a> <p> \"1\" .\n", "<a> <p> \"2\" .\n", "<b> <p> \"3\" .\n", "<b> <p> \"4\" .\n"]
+        path = self.write("a.nt", lines)
+        size = os.path.getsize(path)
+        with open(path, "rb") as fp:
+            fp.seek(len(lines[0]))
+            self.assertEqual(chunks.run_end(fp, size), len(lines[0]) + len(lines[1]))
+            fp.seek(len(lines[0]) + len(lines[1]) + len(lines[2]))
+            self.assertEqual(chunks.run_end(fp, size), size)
+
+
+if __name__ == "__main__":
+    unittest.main()
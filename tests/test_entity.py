@@ -0,0 +1,85 @@
+import copy
+import unittest
+
+from index import entity
+
+
+def run(subject, triples):
+    doc = entity.Entity(subject, subject + "_kw", "http://x.org")
+    for pred, obj in triples:
+        doc.add(pred, "http://x.org/p", obj, "http://x.org/o" if obj.startswith("o") else "")
+    return doc
+
+
+def merge(source, doc, scope, start, n):
+    params = doc.merge_params(entity.run_key(scope, ("/data/" + scope, start, start + 100), n), scope)
+    return entity.apply_script(entity.MERGE_SCRIPT_ID, source, params)
+
+
+class EntityTest(unittest.TestCase):
+    def test_doc_counts(self):
+        doc = run("Athens", [("label", "Athens"), ("type", "o_City"), ("type", "o_Place"), ("label", "Athens"),
+                             ("country", "o_Greece")]).doc()
+        self.assertEqual(doc["predicateKeywords"], ["label", "type", "country"])
+        self.assertEqual(doc["predicateCounts"], {"label": 2, "type": 2, "country": 1})
+        self.assertEqual(doc["tripleCount"], 5)
+        # repeated object keywords are kept, namespaces are not
+        self.assertEqual(doc["objectKeywords"], ["Athens", "o_City", "o_Place", "Athens", "o_Greece"])
+        self.assertEqual(doc["objectNspaceKeys"], ["http://x.org/o"])
+        self.assertEqual(doc["predicateNspaceKeys"], ["http://x.org/p"])
+        self.assertEqual(doc["subjectKeywords"], "Athens_kw")
+
+    def test_split_across_files(self):
+        source = {}
+        self.assertEqual(merge(source, run("Athens", [("label", "Athens"), ("type", "o_City")]),
+                               "labels.nt", 0, 0), "index")
+        self.assertEqual(merge(source, run("Athens", [("type", "o_Place"), ("country", "o_Greece")]),
+                               "types.nt", 300, 2), "index")
+
+        self.assertEqual(source["predicateCounts"], {"label": 1, "type": 2, "country": 1})
+        self.assertEqual(source["tripleCount"], 4)
+        self.assertEqual(sorted(source["objectKeywords"]), ["Athens", "o_City", "o_Greece", "o_Place"])
+        self.assertEqual(sorted(source["sourceFile"]), ["labels.nt", "types.nt"])
+        self.assertEqual(source["subjectKeywords"], "Athens_kw")
+        self.assertEqual(len(source["runs"]), 2)
+
+        # the same as a single run of all the triples
+        single = run("Athens", [("label", "Athens"), ("type", "o_City"), ("type", "o_Place"),
+                                ("country", "o_Greece")]).doc()
+        for field in ("predicateCounts", "tripleCount", "predicateNspaceKeys", "objectNspaceKeys"):
+            self.assertEqual(source[field], single[field])
+
+    def test_merge_again(self):
+        # a run indexed again (resumed chunk) replaces itself
+        source = {}
+        merge(source, run("Athens", [("label", "Athens")]), "labels.nt", 0, 0)
+        merge(source, run("Athens", [("type", "o_City")]), "types.nt", 0, 0)
+        merged = copy.deepcopy(source)
+        merge(source, run("Athens", [("type", "o_City")]), "types.nt", 0, 0)
+        self.assertEqual(source, merged)
+        self.assertEqual(source["tripleCount"], 2)
+
+    def test_remove_file(self):
+        source = {}
+        merge(source, run("Athens", [("label", "Athens"), ("type", "o_City")]), "labels.nt", 0, 0)
+        merge(source, run("Athens", [("type", "o_Place")]), "types.nt", 0, 0)
+        merge(source, run("Athens", [("type", "o_Capital")]), "types.nt", 500, 1)
+
+        params = {"sourceFile": "types.nt"}
+        self.assertEqual(entity.apply_script(entity.REMOVE_SCRIPT_ID, source, params), "index")
+        self.assertEqual(source["predicateCounts"], {"label": 1, "type": 1})
+        self.assertEqual(source["tripleCount"], 2)
+        self.assertEqual(source["sourceFile"], ["labels.nt"])
+
+        # a doc without runs is deleted
+        params = {"sourceFile": "labels.nt"}
+        self.assertEqual(entity.apply_script(entity.REMOVE_SCRIPT_ID, source, params), "delete")
+
+    def test_scripts(self):
+        self.assertEqual(set(entity.SCRIPTS), {entity.MERGE_SCRIPT_ID, entity.REMOVE_SCRIPT_ID})
+        for source in entity.SCRIPTS.values():
+            self.assertEqual(source.count("{"), source.count("}"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from index import ntparser
+
+
+def parse(line):
+    return ntparser.parse_line(line + "\n")
+
+
+class ParseLineTest(unittest.TestCase):
+    def test_iri_triple(self):
+        triple = parse('<http://dbpedia.org/resource/Athens> <http://xmlns.com/foaf/0.1/name> '
+                       '<http://dbpedia.org/resource/Greece> .')
+        self.assertEqual(triple[:3], ("http://dbpedia.org/resource/Athens", "http://xmlns.com/foaf/0.1/name",
+                                      "<http://dbpedia.org/resource/Greece>"))
+        self.assertEqual(triple[3:], ("Athens", "http://dbpedia.org/resource", "name", "http://xmlns.com/foaf/0.1",
+                                      "Greece", "http://dbpedia.org/resource"))
+
+    def test_escapes(self):
+        triple = parse(r'<http://x.org/a> <http://x.org/b> "tab\t quote\" slash\\ café \U0001F600" .')
+        self.assertEqual(triple[7], 'tab\t quote" slash\\ café \U0001F600')
+
+    def test_surrogate_pair(self):
+        triple = parse(r'<http://x.org/a> <http://x.org/b> "smile \uD83D\uDE00"@en .')
+        self.assertEqual(triple[7], "smile \U0001F600")
+        triple[7].encode("utf-8")
+        ntparser.doc_id(*triple[:3])
+
+    def test_lone_surrogate(self):
+        triple = parse(r'<http://x.org/a> <http://x.org/b> "half \uD83D pair" .')
+        self.assertEqual(triple[7], "half \ufffd pair")
+        ntparser.doc_id(*triple[:3])
+
+    def test_out_of_range_escape(self):
+        triple = parse(r'<http://x.org/a> <http://x.org/b> "\U00110000" .')
+        self.assertEqual(triple[7], "\ufffd")
+
+    def test_tags(self):
+        lang = parse('<http://x.org/a> <http://x.org/b> "Athens"@en-GB .')
+        typed = parse('<http://x.org/a> <http://x.org/b> "12"^^<http://www.w3.org/2001/XMLSchema#integer> .')
+        self.assertEqual(lang[2], '"Athens"@en-GB')
+        self.assertEqual(lang[7:], ("Athens", ""))
+        self.assertEqual(typed[2], '"12"^^<http://www.w3.org/2001/XMLSchema#integer>')
+        self.assertEqual(typed[7:], ("12", ""))
+
+    def test_blank_nodes(self):
+        triple = parse('_:b1 <http://x.org/b> _:b2 .')
+        self.assertEqual(triple[0], "_:b1")
+        self.assertEqual(triple[2], "_:b2")
+        self.assertEqual((triple[3], triple[4], triple[7], triple[8]), ("b1", "", "b2", ""))
+
+    def test_trailing_comment(self):
+        triple = parse('<http://x.org/a> <http://x.org/b> "x" . # a comment')
+        self.assertEqual(triple[7], "x")
+        triple = parse('<http://x.org/a> <http://x.org/b> <http://x.org/c> .# "quoted" comment')
+        self.assertEqual(triple[2], "<http://x.org/c>")
+        triple = parse('<http://x.org/a> <http://x.org/b> "x" . # foo "bar" .')
+        self.assertEqual(triple[7], "x")
+        triple = parse(r'<http://x.org/a> <http://x.org/b> "say \"hi\" ." . # "quoted" .')
+        self.assertEqual(triple[7], 'say "hi" .')
+
+    def test_doc_ids(self):
+        objects = ['"Athens"@en', '"Athens"@fr', '"Athens"', '"Athens"^^<http://x.org/t>', '<Athens>', '_:Athens']
+        ids = set()
+        for obj in objects:
+            triple = parse("<http://x.org/a> <http://x.org/b> " + obj + " .")
+            ids.add(ntparser.doc_id(*triple[:3]))
+        self.assertEqual(len(ids), len(objects))
+
+    def test_blank_node_ids(self):
+        blank = parse('_:b1 <http://x.org/b> "x" .')[:3]
+        iri = parse('<http://x.org/a> <http://x.org/b> _:b2 .')[:3]
+        plain = parse('<http://x.org/a> <http://x.org/b> "x" .')[:3]
+        self.assertNotEqual(ntparser.triple_id((), "a.nt", *blank), ntparser.triple_id((), "b.nt", *blank))
+        self.assertNotEqual(ntparser.triple_id((), "a.nt", *iri), ntparser.triple_id((), "b.nt", *iri))
+        self.assertEqual(ntparser.triple_id((), "a.nt", *plain), ntparser.triple_id((), "b.nt", *plain))
+        self.assertEqual(ntparser.triple_id(("a.nt",), "a.nt", *blank), ntparser.doc_id("a.nt", *blank))
+
+    def test_not_triples(self):
+        self.assertIsNone(parse("# a comment"))
+        self.assertIsNone(parse(""))
+        self.assertIsNone(parse('<http://x.org/a> <http://x.org/b> "x"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from index import prop_store, prop_table
+
+
+class PropertyTableTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp.name, "props.db")
+        self.table_path = os.path.join(self.tmp.name, "props.table")
+        prop_store.create(self.store_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, entries):
+        store = prop_store.PropertyStore(self.store_path)
+        for resource, field, value in entries:
+            store.add(resource, field, value)
+        store.close()
+        prop_store.finalize(self.store_path)
+
+    def build(self):
+        keys = prop_table.build(self.store_path, self.table_path)
+        table = prop_table.PropertyTable(self.table_path)
+        self.addCleanup(table.close)
+        return keys, table
+
+    def test_round_trip(self):
+        entries = [("Athens", "rdfs_comment", "capital of Greece"), ("Athens", "rdfs_comment", "ancient city"),
+                   ("Athens", "label", "Αθήνα"), ("Crete", "rdfs_comment", "island \U0001F3DD"),
+                   ("Crete", "label", "")]
+        entries += [("Resource" + str(i), "label", "value " + str(i)) for i in range(200)]
+        self.fill(entries)
+        keys, table = self.build()
+
+        store = prop_store.PropertyStore(self.store_path, readonly=True)
+        self.addCleanup(store.close)
+        self.assertEqual(keys, 204)
+        for resource, field in set((resource, field) for resource, field, value in entries):
+            self.assertEqual(sorted(table.get(resource, field)), sorted(store.get(resource, field)))
+        self.assertEqual(sorted(table.get("Athens", "rdfs_comment")), ["ancient city", "capital of Greece"])
+        self.assertEqual(table.get("Crete", "label"), [""])
+
+    def test_misses(self):
+        self.fill([("Athens", "rdfs_comment", "capital of Greece")])
+        keys, table = self.build()
+        self.assertIsNone(table.get("Sparta", "rdfs_comment"))
+        self.assertIsNone(table.get("Athens", "label"))
+
+    def test_empty_store(self):
+        keys, table = self.build()
+        self.assertEqual(keys, 0)
+        self.assertIsNone(table.get("Athens", "rdfs_comment"))
+
+    def test_hash_collisions(self):
+        entries = [("Resource" + str(i), "label", "value " + str(i)) for i in range(20)]
+        self.fill(entries)
+        # every key has the same hash - found by probing & comparing the keys of the records
+        with mock.patch.object(prop_table.zlib, "crc32", return_value=7):
+            keys, table = self.build()
+            for resource, field, value in entries:
+                self.assertEqual(table.get(resource, field), [value])
+            self.assertIsNone(table.get("Resource20", "label"))
+
+    def test_max_values(self):
+        self.fill([("Athens", "label", str(i)) for i in range(prop_store.MAX_VALUES + 10)])
+        keys, table = self.build()
+        self.assertEqual(len(table.get("Athens", "label")), prop_store.MAX_VALUES)
+
+    def test_stale(self):
+        self.fill([("Athens", "label", "Athens")])
+        self.assertTrue(prop_table.is_stale(self.table_path, self.store_path))
+        self.build()
+        self.assertFalse(prop_table.is_stale(self.table_path, self.store_path))
+        mtime = os.path.getmtime(self.table_path)
+        os.utime(self.store_path, (mtime + 10, mtime + 10))
+        self.assertTrue(prop_table.is_stale(self.table_path, self.store_path))
+
+
+if __name__ == "__main__":
+    unittest.main()